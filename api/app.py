@@ -1,78 +1,282 @@
 # api/app.py
 
+import hashlib
+import io
+import json
 import sys
 import os
+import tempfile
+import threading
 import pandas as pd
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, make_response, send_from_directory, stream_with_context
 
 # 👇 Make sure parent folder is in path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from timetable_pipeline.formatter import (
-    format_section_view,
-    format_teacher_view,
-    format_admin_view,
-)
-from timetable_pipeline.process import run_full_pipeline
+from timetable_pipeline.artifacts import ARTIFACTS_DIR, materialize_views
+from timetable_pipeline.formatter import format_admin_view
+from timetable_pipeline.heal import DEFAULT_ANOMALY_THRESHOLD
+from timetable_pipeline.ingest import SchemaError, read_header, read_timetable_csv
+from timetable_pipeline.jobs import JobQueue, QueueFull
+from timetable_pipeline.metrics import REGISTRY
+from timetable_pipeline.process import MODEL_PATH, PIPELINE_STAGES, open_timetable_db, run_full_pipeline
+from timetable_pipeline.storage import decode_cursor, encode_cursor, iter_csv, iter_ndjson
+from timetable_pipeline.store import TimetableStore
+from timetable_pipeline.validator import validate_timetable
 
 app = Flask(__name__, static_folder="../frontend", static_url_path="")
 
+# 🔥 Load + warm the autoencoder in the background so uploads don't pay for
+# it, while read-only views are served without waiting for torch to import
+def warm_model():
+    from timetable_pipeline.model import warm_up
+    threads = int(os.environ.get("TIMETABLE_TORCH_THREADS", "0")) or None
+    try:
+        warm_up(MODEL_PATH, num_threads=threads)
+    except FileNotFoundError:
+        app.logger.warning("Model checkpoint %s not found; skipping warm-up", MODEL_PATH)
+
+if os.environ.get("TIMETABLE_WARM_UP", "1") != "0":
+    threading.Thread(target=warm_model, name="model-warm-up", daemon=True).start()
+
 # 🏠 Serve frontend editor HTML
 @app.route("/")
 def index():
     return send_from_directory(app.static_folder, "frontend_editor.html")
 
-# 🔄 Load current processed timetable
-def load_final_df():
-    try:
-        return pd.read_csv("data/final_transit_fixed.csv")
-    except FileNotFoundError:
-        return pd.DataFrame([])
+# 🔄 Current processed timetable, loaded once and reloaded when a new version is published
+db = open_timetable_db()
+store = TimetableStore(db)
+
+def cached_json(snapshot, body):
+    response = make_response(body)
+    response.mimetype = "application/json"
+    response.set_etag(snapshot.etag)
+    if snapshot.last_modified is not None:
+        response.last_modified = snapshot.last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 # 📘 Section-wise API
 @app.route("/timetable/section/<section_id>", methods=["GET"])
 def get_section(section_id):
-    df = load_final_df()
-    return jsonify(format_section_view(df, section_id))
+    snapshot = store.snapshot()
+    return cached_json(snapshot, snapshot.entity_json("section", section_id))
 
 # 👨‍🏫 Teacher-wise API
 @app.route("/timetable/teacher/<teacher_id>", methods=["GET"])
 def get_teacher(teacher_id):
-    df = load_final_df()
-    return jsonify(format_teacher_view(df, teacher_id))
+    snapshot = store.snapshot()
+    return cached_json(snapshot, snapshot.entity_json("teacher", teacher_id))
+
+# 📄 Cursor pages and streamed rows of a stored version
+DEFAULT_PAGE_ROWS = 1000
+MAX_PAGE_ROWS = 10000
+STREAM_FORMATS = {"csv": ("text/csv", iter_csv), "ndjson": ("application/x-ndjson", iter_ndjson)}
+
+def page_args():
+    """(version, after, limit) from ?cursor= and ?limit=; ValueError if invalid."""
+    cursor = request.args.get("cursor")
+    version, after = decode_cursor(cursor) if cursor else (None, 0)
+    limit = request.args.get("limit")
+    if limit is not None:
+        if not limit.isdigit() or not 0 < int(limit) <= MAX_PAGE_ROWS:
+            raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_ROWS}")
+        limit = int(limit)
+    elif cursor:
+        limit = DEFAULT_PAGE_ROWS
+    return version, after, limit
 
-# 🛠️ Admin full view
+def table_response(fmt, transform=None, version=None, **select):
+    """
+    Rows of a stored version as fmt (json, csv or ndjson). With ?limit= or
+    ?cursor= one page is returned, with the cursor of the next page in the
+    JSON body or the X-Next-Cursor header (absent on the last page); a
+    cursor pins the version it was issued for. Otherwise csv/ndjson are
+    streamed chunk by chunk from the database.
+    """
+    transform = transform or (lambda df: df)
+    try:
+        if fmt != "json" and fmt not in STREAM_FORMATS:
+            raise ValueError(f"format must be one of: json, {', '.join(STREAM_FORMATS)}")
+        cursor_version, after, limit = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    version = cursor_version or version
+
+    try:
+        if limit is not None:
+            version, df, next_after = db.load_page(limit, after, name=store.name, version=version, **select)
+        else:
+            version, chunks = db.iter_chunks(name=store.name, version=version, after=after, **select)
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    if version is None:
+        return jsonify({'error': 'No timetable stored'}), 404
+
+    if limit is None:
+        mimetype, serialize = STREAM_FORMATS[fmt]
+        response = Response(stream_with_context(serialize(transform(df) for df in chunks)), mimetype=mimetype)
+    else:
+        next_cursor = None if next_after is None else encode_cursor(version, next_after)
+        rows = transform(df)
+        if fmt == "json":
+            # Rows are serialized by pandas; only the envelope goes through json
+            response = make_response('{"version": %s, "next_cursor": %s, "rows": %s}' % (
+                json.dumps(f"v{version}"), json.dumps(next_cursor), rows.to_json(orient="records")))
+            response.mimetype = "application/json"
+        else:
+            mimetype, serialize = STREAM_FORMATS[fmt]
+            response = make_response("".join(serialize([rows])))
+            response.mimetype = mimetype
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["X-Timetable-Version"] = f"v{version}"
+    return response
+
+# 🛠️ Admin full view; ?limit= / ?cursor= pages, ?format=ndjson|csv streams
 @app.route("/timetable/admin", methods=["GET"])
 def get_admin():
-    df = load_final_df()
-    return jsonify(format_admin_view(df))
+    fmt = request.args.get("format", "json")
+    if fmt == "json" and "limit" not in request.args and "cursor" not in request.args:
+        snapshot = store.snapshot()
+        return cached_json(snapshot, snapshot.admin_json())
+    return table_response(fmt, format_admin_view)
+
+# ⚙️ Background pipeline runs
+jobs = JobQueue()
+
+# ⬆️ Upload → queue pipeline job → poll /jobs/<id>
+UPLOAD_BLOCK = 1 << 20
+
+def spool_upload(upload):
+    """Copy an uploaded file to a temp file block by block; returns (path, sha256)."""
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix="timetable-upload-", suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for block in iter(lambda: upload.stream.read(UPLOAD_BLOCK), b""):
+                digest.update(block)
+                f.write(block)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest
 
-# ⬆️ Upload + Process + Save CSV via Pipeline
 @app.route("/upload-timetable", methods=["POST"])
 def upload_and_process():
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
 
-    file = request.files['file']
-    df = pd.read_csv(file)
+    incremental = request.form.get("incremental", "").lower() in ("1", "true", "yes")
+    try:
+        threshold = float(request.form.get("anomaly_threshold", DEFAULT_ANOMALY_THRESHOLD))
+    except ValueError:
+        return jsonify({'error': 'anomaly_threshold must be a number'}), 400
 
-    # ✅ Run pipeline + get processed dataframe
-    final_df = run_full_pipeline(df)
+    # 📥 Spool to disk and reject a bad header before queueing anything
+    path, digest = spool_upload(request.files['file'])
+    try:
+        read_header(path)
+    except (SchemaError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        os.unlink(path)
+        return jsonify({'error': str(e)}), 400
+    digest.update(f"|incremental={incremental}|threshold={threshold}".encode())
+    key = digest.hexdigest()
 
-    # ✅ Save as latest for all views to load
-    final_df.to_csv("data/final_transit_fixed.csv", index=False)
+    def run(job):
+        try:
+            # Typed, chunked read; a bad row fails the job with its row number
+            timetable = read_timetable_csv(path)
+        finally:
+            os.unlink(path)
 
-    # ✅ Return admin-format JSON for UI
-    return jsonify(format_admin_view(final_df))
+        # ✅ Run pipeline + get processed dataframe
+        final_df, run_metrics = run_full_pipeline(
+            timetable, incremental=incremental, db=db, progress=job.progress, return_metrics=True,
+            anomaly_threshold=threshold
+        )
 
-from flask import send_file
+        # ✅ Publish as a new version for all views to load (atomic swap)
+        snapshot = store.replace(final_df, source="upload")
+        result = {"rows": len(final_df), "version": snapshot.etag, "url": "/timetable/admin",
+                  "metrics": run_metrics}
 
+        # 🗂️ Static per-section/per-teacher files; the version is already live if this fails
+        if ARTIFACTS_DIR:
+            try:
+                result["artifacts"] = materialize_views(snapshot.df, snapshot.etag)
+            except Exception as e:
+                app.logger.warning("Materializing views for %s failed: %s", snapshot.etag, e)
+                result["artifacts"] = {"error": str(e)}
+        return result
+
+    try:
+        job = jobs.submit(key, run, stages=PIPELINE_STAGES, discard=lambda: os.unlink(path))
+    except QueueFull as e:
+        os.unlink(path)
+        return jsonify({'error': str(e)}), 503
+
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response
+
+# ✅ Validate a timetable without running the pipeline
+def read_timetable_body():
+    if 'file' in request.files:
+        return pd.read_csv(request.files['file'])
+    if request.is_json:
+        payload = request.get_json()
+        if isinstance(payload, dict):
+            return pd.DataFrame(payload.get("rows", []), columns=payload.get("columns"))
+        return pd.DataFrame(payload)
+    return pd.read_csv(io.BytesIO(request.get_data()))
+
+@app.route("/validate", methods=["POST"])
+def validate():
+    try:
+        df = read_timetable_body()
+        return jsonify(validate_timetable(df))
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        return jsonify({'error': str(e)}), 400
+
+# 📊 Job status / progress / result
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+# 📈 Prometheus-style pipeline metrics
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    response = make_response(REGISTRY.render())
+    response.mimetype = "text/plain"
+    response.headers["Content-Type"] = "text/plain; version=0.0.4"
+    return response
+
+# 📤 Streamed CSV export of a stored version, with optional projection / filters
 @app.route("/load-final-csv")
 def load_final_csv():
-    try:
-        return send_file("../data/final_transit_fixed.csv", mimetype="text/csv")
-    except FileNotFoundError:
-        return "No CSV found", 404
+    return table_response("csv")
+
+@app.route("/timetable/export.csv", methods=["GET"])
+def export_csv():
+    def listed(name):
+        values = request.args.getlist(name)
+        return [v for value in values for v in value.split(",") if v] or None
+
+    version = request.args.get("version", type=int)
+    return table_response(request.args.get("format", "csv"), version=version, columns=listed("columns"),
+                          sections=listed("section"), teachers=listed("teacher"))
+
+# 🗄️ Stored versions (newest last) and the current one
+@app.route("/timetable/versions", methods=["GET"])
+def list_versions():
+    versions = db.versions(name=store.name)
+    return jsonify({"current": db.current_version(store.name), "versions": versions.to_dict(orient="records")})
 
 
 # 🚀 Launch API
@@ -0,0 +1,179 @@
+"""
+Headless batch runner: heal + solve many timetables in a process pool.
+
+    python batch_run.py data/campuses/ extra_variant.csv --workers 8 --out batch_output
+
+Inputs are CSV files or directories of CSVs. Each worker process loads
+the autoencoder and reference workbooks once, then runs
+run_full_pipeline on one input at a time. As each job finishes its
+output CSV is written to --out and a line is appended to
+--out/summary.jsonl, so a long run can be followed (and a crash loses
+nothing already done).
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def collect_inputs(paths, pattern="*.csv"):
+    """Expand files and directories into a sorted, de-duplicated list of absolute CSV paths."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            raise FileNotFoundError(f"No such input: {path}")
+    seen, inputs = set(), []
+    for path in map(os.path.abspath, found):
+        if path not in seen:
+            seen.add(path)
+            inputs.append(path)
+    return inputs
+
+
+def output_names(inputs):
+    """Output file name per input; stems that repeat across directories get a numeric suffix."""
+    names, used = {}, {}
+    for path in inputs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        count = used.get(stem, 0)
+        used[stem] = count + 1
+        names[path] = f"{stem}.csv" if count == 0 else f"{stem}_{count}.csv"
+    return names
+
+
+def _write_csv_atomic(df, path):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            df.to_csv(f, index=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+# 👷 Worker side: heavy imports and reference data live here, once per process
+def _init_worker(torch_threads):
+    os.chdir(ROOT)  # pipeline paths (model, transit workbook) are repo-relative
+    sys.path.insert(0, ROOT)
+
+    from timetable_pipeline.model import warm_up
+    from timetable_pipeline.process import MODEL_PATH
+    from timetable_pipeline.reference import load_teacher_map, load_transit_matrix
+
+    warm_up(MODEL_PATH, num_threads=torch_threads)
+    load_transit_matrix()
+    try:
+        load_teacher_map()
+    except Exception:
+        pass  # the pipeline falls back to TeacherID
+
+
+def _run_job(input_path, output_path, anomaly_threshold):
+    from timetable_pipeline.ingest import read_timetable_csv
+    from timetable_pipeline.process import run_full_pipeline
+    from timetable_pipeline.validator import validate_timetable
+
+    started = time.time()
+    summary = {"input": input_path, "output": output_path, "pid": os.getpid()}
+    try:
+        df = read_timetable_csv(input_path)
+        options = {} if anomaly_threshold is None else {"anomaly_threshold": anomaly_threshold}
+        final_df, metrics = run_full_pipeline(df, return_metrics=True, **options)
+        _write_csv_atomic(final_df, output_path)
+        heal = next((s for s in metrics["stages"] if s["stage"] == "heal"), {})
+        summary.update({
+            "status": "ok",
+            "rows_in": len(df),
+            "rows_out": len(final_df),
+            "sections": heal.get("sections"),
+            "anomalous_sections": heal.get("anomalous_sections"),
+            "stage_seconds": {s["stage"]: round(s["wall_seconds"], 4) for s in metrics["stages"]},
+            "issues": validate_timetable(final_df, limit=0)["counts"],
+        })
+    except Exception as e:
+        summary.update({"status": "failed", "error": f"{type(e).__name__}: {e}",
+                        "traceback": traceback.format_exc()})
+    summary["seconds"] = round(time.time() - started, 4)
+    return summary
+
+
+# 🧭 Parent side: schedule jobs and stream results to disk
+def run_batch(inputs, out_dir, workers=None, anomaly_threshold=None, torch_threads=1):
+    """
+    Run every input through the pipeline; returns the list of per-job
+    summaries. anomaly_threshold=None uses the pipeline's default.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = output_names(inputs)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(inputs) or 1))
+    summary_path = os.path.join(out_dir, "summary.jsonl")
+
+    results = []
+    # spawn: forked children would inherit torch/OpenMP thread state
+    context = multiprocessing.get_context("spawn")
+    with open(summary_path, "a") as summary_file, ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(torch_threads,)
+    ) as pool:
+        futures = {
+            pool.submit(_run_job, path, os.path.join(out_dir, names[path]), anomaly_threshold): path
+            for path in inputs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                summary = future.result()
+            except Exception as e:  # worker died (e.g. out of memory)
+                summary = {"input": futures[future], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            summary["finished"] = time.time()
+            summary_file.write(json.dumps(summary) + "\n")
+            summary_file.flush()
+            results.append(summary)
+
+            mark = "✅" if summary["status"] == "ok" else "❌"
+            detail = f"{summary.get('rows_out')} rows" if summary["status"] == "ok" else summary["error"]
+            print(f"{mark} [{done}/{len(inputs)}] {os.path.basename(summary['input'])}: "
+                  f"{detail} in {summary.get('seconds', 0):.2f}s", flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="input CSV files and/or directories of CSVs")
+    parser.add_argument("--out", default="batch_output", help="directory for outputs and summary.jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--pattern", default="*.csv", help="file pattern inside input directories")
+    parser.add_argument("--anomaly-threshold", type=float, default=None,
+                        help="heal only sections scoring above this (default: pipeline default)")
+    parser.add_argument("--torch-threads", type=int, default=1,
+                        help="torch threads per worker (keep workers x threads <= cores)")
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.pattern)
+    if not inputs:
+        print("No input CSVs found.")
+        return 1
+
+    started = time.time()
+    results = run_batch(inputs, os.path.abspath(args.out), args.workers,
+                        args.anomaly_threshold, args.torch_threads)
+    failed = sum(1 for r in results if r["status"] != "ok")
+    print(f"📄 {len(results) - failed} ok, {failed} failed in {time.time() - started:.1f}s; "
+          f"summary in {os.path.join(args.out, 'summary.jsonl')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Scaling benchmark for every pipeline stage on synthetic timetables.
+
+    python benchmarks/run_benchmarks.py --sizes 10 100 500 2000 --out bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json --tolerance 1.3
+
+Each stage (heal, solve, map_blocks, transit, rooms, and the admin/section/
+teacher formatter views) is timed on its own, repeat times per size, and
+the report is written as JSON. With --compare, timings are checked
+against an earlier report and the run exits non-zero on regressions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_room_inventory, generate_timetable, generate_transit_table
+from timetable_pipeline.conflict_solver import solve_teacher_conflict
+from timetable_pipeline.formatter import format_admin_view, format_section_view, format_teacher_view
+from timetable_pipeline.heal import DEFAULT_ANOMALY_THRESHOLD, reconstruct_anomalous_sections
+from timetable_pipeline.process import MODEL_PATH, map_room_blocks
+from timetable_pipeline.rooms import allocate_rooms, build_room_inventory
+from timetable_pipeline.timetable import SLOTS_PER_WEEK
+from timetable_pipeline.transit import build_transit_map, compile_transit_map, repair_transit_violations
+
+DEFAULT_SIZES = [10, 50, 200, 500, 1000, 2000]
+
+
+def time_call(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def bench_size(n_sections, args):
+    df = generate_timetable(
+        n_sections, n_teachers=args.teachers, slots_per_week=args.slots,
+        subjects_per_section=args.subjects_per_section, seed=args.seed,
+    )
+    transit_df = generate_transit_table(sorted(df["Block"].unique()), seed=args.seed)
+    transit = compile_transit_map(build_transit_map(transit_df))
+    inventory = build_room_inventory(generate_room_inventory(df, args.rooms_per_peak))
+    model_path = os.path.join(ROOT, MODEL_PATH)
+
+    stages = [
+        ("heal", lambda: reconstruct_anomalous_sections(
+            df.copy(), model_path, valid_df=df.copy(), threshold=args.anomaly_threshold)),
+        ("solve", lambda: solve_teacher_conflict(
+            df, num_search_workers=args.workers, max_time_in_seconds=args.solver_time_limit)),
+        ("map_blocks", lambda: map_room_blocks(df.copy())),
+        ("transit", lambda: repair_transit_violations(df, transit)),
+        ("rooms", lambda: allocate_rooms(
+            df, inventory, transit, num_search_workers=args.workers, max_time_in_seconds=args.solver_time_limit)),
+        ("format_admin", lambda: format_admin_view(df)),
+        ("format_section", lambda: format_section_view(df)),
+        ("format_teacher", lambda: format_teacher_view(df)),
+    ]
+
+    results = []
+    for stage, fn in stages:
+        if args.stages and stage not in args.stages:
+            continue
+        times, out = time_call(fn, args.repeat)
+        results.append({
+            "sections": n_sections,
+            "teachers": int(df["TeacherID"].nunique()),
+            "rows": len(df),
+            "stage": stage,
+            "output_rows": len(out),
+            "min_seconds": min(times),
+            "median_seconds": statistics.median(times),
+            "runs": times,
+        })
+        print(f"{n_sections:>6} sections  {stage:<15} {min(times):9.4f}s  (median {statistics.median(times):.4f}s)",
+              flush=True)
+    return results
+
+
+def environment():
+    versions = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__}
+    for module in ("torch", "ortools"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"platform": platform.platform(), "cpu_count": os.cpu_count(), "commit": commit, **versions}
+
+
+def compare(report, baseline, tolerance):
+    """Return (sections, stage, old, new) for timings slower than tolerance x baseline."""
+    old = {(r["sections"], r["stage"]): r["min_seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        before = old.get((r["sections"], r["stage"]))
+        if before is not None and r["min_seconds"] > before * tolerance:
+            regressions.append((r["sections"], r["stage"], before, r["min_seconds"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="section counts")
+    parser.add_argument("--teachers", type=int, default=None, help="teacher count (default scales with sections)")
+    parser.add_argument("--slots", type=int, default=SLOTS_PER_WEEK, help="slots per week")
+    parser.add_argument("--subjects-per-section", type=int, default=8)
+    parser.add_argument("--stages", nargs="+", default=None, help="only run these stages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=8, help="CP-SAT search workers")
+    parser.add_argument("--solver-time-limit", type=float, default=10.0)
+    parser.add_argument("--anomaly-threshold", type=float, default=DEFAULT_ANOMALY_THRESHOLD,
+                        help="heal only sections scoring above this")
+    parser.add_argument("--rooms-per-peak", type=float, default=0.9,
+                        help="rooms per block as a share of its busiest slot (<1 contests slots)")
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--compare", default=None, help="baseline report to check against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed slowdown factor")
+    args = parser.parse_args(argv)
+
+    # Load the baseline first; writing --out over it would compare the run with itself
+    baseline = None
+    if args.compare:
+        if os.path.abspath(args.compare) == os.path.abspath(args.out):
+            parser.error("--out and --compare must be different files")
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = {"created": time.time(), "environment": environment(), "config": vars(args), "results": []}
+    for n_sections in args.sizes:
+        report["results"].extend(bench_size(n_sections, args))
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Report written to {args.out}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for sections, stage, before, after in regressions:
+            print(f"⚠️ {stage} @ {sections} sections: {before:.4f}s → {after:.4f}s")
+        if regressions:
+            return 1
+        print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Seeded synthetic timetables in the pipeline's CSV schema
+(SectionID, SlotIndex, SubjectCode, TeacherID, Scheme, Subject, RoomType, Block)
+plus matching transit and room inventory tables, for benchmarking at
+arbitrary scale.
+"""
+
+import numpy as np
+import pandas as pd
+
+from timetable_pipeline.reference import ROOMTYPE_TO_BLOCK
+from timetable_pipeline.timetable import SLOTS_PER_WEEK
+
+# Human-style room type names; lower-cased they match reference.ROOMTYPE_TO_BLOCK
+ROOM_TYPES = [
+    "Block A-DL and B-WL", "Block C-WL", "CAM-3 Lab", "CAM 3 Chem Lab", "CAM 3 (Class)",
+    "CAM 8 EM Lab", "CAM 8 Workshop", "CAM 12 (Class)", "CAM 13 SY", "Camp 3 Block A",
+    "Camp 3 Block E", "Campus 17 (Class)", "Campus 3 (Physics/ED)", "Campus 8 (Class)",
+]
+
+def generate_timetable(n_sections, n_teachers=None, slots_per_week=SLOTS_PER_WEEK, subjects_per_section=8,
+                       n_subjects=None, seed=0):
+    """
+    Build a timetable of n_sections x slots_per_week rows.
+
+    Each section takes subjects_per_section subjects from a shared pool;
+    (section, subject) pairs are dealt to teachers evenly, about 40
+    lessons per teacher by default. Subjects carry a fixed scheme and
+    room type, and Block follows the pipeline's RoomType → Block mapping.
+    """
+    rng = np.random.default_rng(seed)
+    n_teachers = n_teachers or max(4, n_sections * slots_per_week // 40)  # ~40 lessons each
+    n_subjects = n_subjects or max(subjects_per_section, min(200, n_sections // 2 + 12))
+
+    subject_codes = np.array([f"S{i:04d}" for i in range(n_subjects)])
+    subject_scheme = rng.choice(["A", "B"], n_subjects)
+    subject_room = rng.choice(ROOM_TYPES, n_subjects)
+
+    section_ids = np.array([f"SEC{i:05d}" for i in range(n_sections)])
+    section_subjects = np.argsort(rng.random((n_sections, n_subjects)), axis=1)[:, :subjects_per_section]
+    # Deal (section, subject) pairs to teachers round-robin so loads differ by at most one pair
+    section_teachers = (rng.permutation(n_sections * subjects_per_section) % n_teachers).reshape(n_sections, -1)
+
+    # Lessons per subject: split the week as evenly as possible, shuffled
+    lesson_slot = np.tile(np.arange(slots_per_week) % subjects_per_section, (n_sections, 1))
+    lesson_slot = np.take_along_axis(lesson_slot, np.argsort(rng.random(lesson_slot.shape), axis=1), axis=1)
+
+    subj = np.take_along_axis(section_subjects, lesson_slot, axis=1).ravel()
+    teach = np.take_along_axis(section_teachers, lesson_slot, axis=1).ravel()
+    room = subject_room[subj]
+
+    return pd.DataFrame({
+        "SectionID": np.repeat(section_ids, slots_per_week),
+        "SlotIndex": np.tile(np.arange(slots_per_week), n_sections),
+        "SubjectCode": subject_codes[subj],
+        "TeacherID": teach,
+        "Scheme": subject_scheme[subj],
+        "Subject": subject_codes[subj],
+        "RoomType": room,
+        "Block": pd.Series(room).str.lower().map(ROOMTYPE_TO_BLOCK).fillna("Unknown-Block").to_numpy(),
+    })
+
+def generate_transit_table(locations, seed=0, max_minutes=90):
+    """
+    Symmetric transit table over locations in the workbook's schema
+    (LOCATION A, LOCATION B, TRANSIT TIME(Minutes)); 0 minutes on the diagonal.
+    """
+    rng = np.random.default_rng(seed)
+    locations = list(locations)
+    rows = []
+    for i, a in enumerate(locations):
+        for b in locations[i:]:
+            minutes = 0 if a == b else int(rng.integers(1, max_minutes // 10 + 1)) * 10
+            rows.append((a, b, minutes))
+    return pd.DataFrame(rows, columns=["LOCATION A", "LOCATION B", "TRANSIT TIME(Minutes)"])
+
+
+def generate_room_inventory(df, rooms_per_peak=1.0):
+    """
+    RoomID / Block inventory for a timetable: each Block gets
+    rooms_per_peak x its busiest slot's session count (at least one room),
+    so values below 1 leave some slots contested.
+    """
+    peak = df.groupby(["Block", "SlotIndex"]).size().groupby(level="Block").max()
+    rooms = [
+        (f"{block}-R{i:03d}", block)
+        for block, sessions in peak.items()
+        for i in range(max(1, int(np.ceil(sessions * rooms_per_peak))))
+    ]
+    return pd.DataFrame(rooms, columns=["RoomID", "Block"])
@@ -1,34 +1,42 @@
 import streamlit as st
 import pandas as pd
-from timetable_pipeline.process import run_full_pipeline
+from timetable_pipeline.artifacts import ARTIFACTS_DIR, materialize_views
+from timetable_pipeline.heal import DEFAULT_ANOMALY_THRESHOLD
+from timetable_pipeline.process import open_timetable_db, run_full_pipeline
 from timetable_pipeline.formatter import format_output
+from timetable_pipeline.reference import load_teacher_map
+from timetable_pipeline.timetable import SLOTS_PER_DAY
+from timetable_pipeline.validator import validate_timetable
 
-# File Paths
-ORIGINAL_FILE = "data/final_transit_fixed.csv"
-UPDATED_FILE = "data/updated_from_ui.csv"
+# Versioned timetable store + reference files
+DRAFT_NAME = "draft"
 TEACHER_MAP_FILE = "data/synthetic_teachers_fixed.xlsx"
 
+@st.cache_resource
+def get_db():
+    return open_timetable_db()
+
+# Cached per stored version, so a newly published timetable is picked up
 @st.cache_data
-def load_data():
+def load_data(version):
     try:
-        df = pd.read_csv(ORIGINAL_FILE)
-        if df.empty:
-            st.warning("CSV file is empty.")
+        df = get_db().load(version=version)
+        if df is None or df.empty:
+            st.warning("No timetable stored yet.")
             return pd.DataFrame()
         return df
-    except FileNotFoundError:
-        st.warning("CSV file not found.")
-        return pd.DataFrame()
     except Exception as e:
-        st.error(f"Error loading CSV: {e}")
+        st.error(f"Error loading timetable: {e}")
         return pd.DataFrame()
 
 def save_data(df):
     try:
-        df.to_csv(UPDATED_FILE, index=False)
-        st.success("✅ Changes saved to updated_from_ui.csv!")
+        version = get_db().save(df, name=DRAFT_NAME, source="streamlit")
+        st.success(f"✅ Changes saved as draft version {version}!")
+        st.download_button("📥 Download draft CSV", get_db().export_csv(version=version),
+                           file_name="updated_from_ui.csv", mime="text/csv")
     except Exception as e:
-        st.error(f"Error saving CSV: {e}")
+        st.error(f"Error saving timetable: {e}")
 
 def sort_df(df):
     if "SectionID" in df.columns and "SlotIndex" in df.columns:
@@ -39,17 +47,16 @@ def sort_df(df):
 def enhance_readability(df):
     # Day & Time
     day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-    df["Day"] = df["SlotIndex"] // 8
-    df["StartHour"] = 8 + (df["SlotIndex"] % 8)
+    df["Day"] = df["SlotIndex"] // SLOTS_PER_DAY
+    df["StartHour"] = 8 + (df["SlotIndex"] % SLOTS_PER_DAY)
     df["EndHour"] = df["StartHour"] + 1
     df["Day"] = df["Day"].apply(lambda d: day_names[d] if d < len(day_names) else "Unknown")
     df["Time"] = df["StartHour"].astype(str) + ":00 - " + df["EndHour"].astype(str) + ":00"
 
     # Teacher Name mapping
     try:
-        teacher_map_df = pd.read_excel(TEACHER_MAP_FILE)
-        teacher_map = dict(zip(teacher_map_df["TeacherID"], teacher_map_df["TeacherName"]))
-        df["TeacherName"] = df["TeacherID"].map(teacher_map).fillna("Unknown Faculty")
+        teacher_map = load_teacher_map(TEACHER_MAP_FILE)
+        df["TeacherName"] = df["TeacherID"].astype(str).str.strip().map(teacher_map).fillna("Unknown Faculty")
     except Exception as e:
         st.warning(f"⚠️ Could not load teacher mapping: {e}")
         df["TeacherName"] = df["TeacherID"]
@@ -60,14 +67,30 @@ def enhance_readability(df):
 st.set_page_config(layout="wide")
 st.title("📅 Smart Timetable Editor (Human-Readable View + Healing Pipeline)")
 
-df = load_data()
+df = load_data(get_db().current_version())
 df = sort_df(df)
 
 if not df.empty:
     st.subheader("✍️ Editable Timetable")
     edited_df = st.data_editor(df, num_rows="dynamic", use_container_width=True)
 
+    # 🔍 Live validation (Streamlit reruns on every edit)
+    try:
+        report = validate_timetable(edited_df)
+        problems = {kind: n for kind, n in report["counts"].items() if n}
+        if problems:
+            st.warning("⚠️ " + " · ".join(f"{kind.replace('_', ' ')}: {n}" for kind, n in problems.items()))
+            with st.expander("Validation details"):
+                st.json(report["issues"])
+        else:
+            st.success("✅ No problems found")
+    except ValueError as e:
+        st.error(f"❌ Cannot validate timetable: {e}")
+
     col1, col2 = st.columns(2)
+    incremental = st.checkbox("⚡ Incremental: re-solve only edited sections", value=False)
+    anomaly_threshold = st.slider("🩺 Anomaly threshold (sections scoring above it are healed)",
+                                  0.0, 1.0, DEFAULT_ANOMALY_THRESHOLD, 0.05)
 
     with col1:
         if st.button("💾 Save Edited CSV"):
@@ -77,12 +100,28 @@ if not df.empty:
         if st.button("⚙️ Run Full Healing Pipeline"):
             try:
                 st.info("Running full healing + conflict-solving pipeline...")
-                healed_df = run_full_pipeline(edited_df)
+                healed_df = run_full_pipeline(edited_df, incremental=incremental, db=get_db(),
+                                              anomaly_threshold=anomaly_threshold)
+                version = get_db().save(healed_df, source="streamlit")
+                st.info(f"🗄️ Published as timetable version {version}")
+                if ARTIFACTS_DIR:
+                    try:
+                        summary = materialize_views(get_db().load(version=version), f"v{version}")
+                        st.info(f"🗂️ Views written to {summary['dir']} "
+                                f"({summary['built']} rebuilt, {summary['reused']} unchanged)")
+                    except Exception as e:
+                        st.warning(f"⚠️ Could not write per-section/teacher files: {e}")
 
                 # Warn for Unknown-Block
                 if (healed_df["Block"] == "Unknown-Block").sum() > 0:
                     st.warning("⚠️ Some rows still have 'Unknown-Block'. Check RoomType mapping or subject data.")
 
+                # Sections ranked by anomaly score
+                scores = healed_df.groupby("SectionID")["AnomalyScore"].first().sort_values(ascending=False)
+                healed = int((scores > anomaly_threshold).sum())
+                with st.expander(f"🩺 Anomaly scores ({healed} of {len(scores)} sections healed)"):
+                    st.dataframe(scores.rename("AnomalyScore").reset_index(), use_container_width=True)
+
                 # Enhance for readability
                 healed_df = enhance_readability(healed_df)
 
@@ -0,0 +1,43 @@
+import json
+import os
+
+import pandas as pd
+
+from timetable_pipeline.artifacts import materialize_views
+
+
+def _timetable():
+    return pd.DataFrame({
+        "SectionID": ["SEC01", "SEC01", "SEC02"],
+        "SlotIndex": [0, 1, 0],
+        "SubjectCode": ["MATH", "PHY", "MATH"],
+        "TeacherID": ["T1", "T2", "T3"],
+        "RoomType": ["campus 8 (class)"] * 3,
+        "Block": ["Block-C8"] * 3,
+    })
+
+
+def test_only_changed_entities_are_rebuilt(tmp_path):
+    df = _timetable()
+    materialize_views(df, "v1", str(tmp_path), workers=1, term_start="2026-01-05")
+    df.loc[2, "SubjectCode"] = "ART"
+
+    summary = materialize_views(df, "v2", str(tmp_path), workers=1)
+
+    # SEC02 and its teacher T3 changed; SEC01, T1 and T2 did not
+    assert (summary["built"], summary["reused"]) == (2, 3)
+    assert os.readlink(tmp_path / "current") == "v2"
+    with open(tmp_path / "current" / "section" / "SEC02.json") as f:
+        assert json.load(f)[0]["SubjectCode"] == "ART"
+
+
+def test_current_never_moves_back_to_an_older_version(tmp_path):
+    df = _timetable()
+    materialize_views(df, "v2", str(tmp_path), workers=1, term_start="2026-01-05")
+
+    summary = materialize_views(df, "v1", str(tmp_path), workers=1)
+
+    assert summary["current"] is False
+    assert os.readlink(tmp_path / "current") == "v2"
+    with open(tmp_path / "current.json") as f:
+        assert json.load(f)["version"] == "v2"
@@ -0,0 +1,56 @@
+from collections import Counter
+
+import pandas as pd
+
+from timetable_pipeline.conflict_solver import find_changed_sections, solve_teacher_conflict
+
+
+def _timetable(rows):
+    return pd.DataFrame(rows, columns=["SectionID", "SlotIndex", "SubjectCode", "TeacherID"])
+
+
+def _lessons(df):
+    return zip(df["SectionID"], df["SubjectCode"], df["TeacherID"])
+
+
+def _double_bookings(df, column):
+    counts = df.groupby([column, "SlotIndex"]).size()
+    return int((counts - 1).clip(lower=0).sum())
+
+
+def test_solver_removes_teacher_double_bookings_when_feasible():
+    # T1 teaches both sections in slots 0 and 1
+    df = _timetable([
+        ("A", 0, "MATH", "T1"), ("A", 1, "MATH", "T1"), ("A", 2, "PHY", "T2"), ("A", 3, "PHY", "T2"),
+        ("B", 0, "MATH", "T1"), ("B", 1, "MATH", "T1"), ("B", 2, "CHEM", "T3"), ("B", 3, "CHEM", "T3"),
+    ])
+    stats = []
+
+    out = solve_teacher_conflict(df, num_search_workers=1, max_time_in_seconds=10, solver_stats=stats)
+
+    assert _double_bookings(out, "TeacherID") == 0
+    assert _double_bookings(out, "SectionID") == 0
+    assert Counter(_lessons(out)) == Counter(_lessons(df))
+    assert stats[0]["teacher_overlaps"] == 0
+
+
+def test_overbooked_teacher_keeps_only_unavoidable_double_bookings():
+    # T1 has 6 lessons but there are only 3 slots: 3 double-bookings are unavoidable
+    rows = [(sec, slot, "MATH", "T1") for sec in "ABC" for slot in (0, 1)]
+    rows += [(sec, 2, "ART", f"T{sec}") for sec in "ABC"]
+    df = _timetable(rows)
+    stats = []
+
+    out = solve_teacher_conflict(df, num_search_workers=1, max_time_in_seconds=10, solver_stats=stats)
+
+    assert _double_bookings(df, "TeacherID") == 4  # all three sections teach T1 in slots 0 and 1
+    assert _double_bookings(out, "TeacherID") == 3
+    assert _double_bookings(out, "SectionID") == 0
+    assert stats[0]["repair"]["teacher_overlaps"] == 3
+
+
+def test_find_changed_sections_reports_edited_added_and_removed_sections():
+    before = _timetable([("A", 0, "MATH", "T1"), ("B", 0, "PHY", "T2"), ("C", 0, "ART", "T3")])
+    after = _timetable([("A", 0, "MATH", "T1"), ("B", 1, "PHY", "T2"), ("D", 0, "ART", "T3")])
+
+    assert find_changed_sections(after, before) == {"B", "C", "D"}
@@ -0,0 +1,57 @@
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from timetable_pipeline.heal import DEFAULT_ANOMALY_THRESHOLD, reconstruct_anomalous_sections, snap_to_valid
+
+
+def test_snap_to_valid_matches_exact_argmin_on_wide_id_range():
+    rng = np.random.default_rng(0)
+    # (subject, teacher, block) codes with full-campus teacher ID ranges
+    valid = np.column_stack([
+        rng.integers(0, 400, 3000),
+        rng.integers(0, 10_000, 3000),
+        rng.integers(0, 20, 3000),
+    ]).astype(np.float32)
+    decoded = (valid[rng.integers(0, len(valid), 5000)]
+               + rng.normal(0, 3, (5000, 3))).astype(np.float32)
+
+    exact = np.concatenate([
+        np.linalg.norm(chunk.astype(np.float64)[:, None, :] - valid.astype(np.float64), axis=2).argmin(axis=1)
+        for chunk in np.array_split(decoded, 20)
+    ])
+    np.testing.assert_array_equal(snap_to_valid(decoded, valid, memory_bytes=1 << 20), exact)
+
+
+def test_snap_to_valid_stays_within_its_memory_budget():
+    rng = np.random.default_rng(1)
+    valid = rng.integers(0, 1000, (200_000, 3)).astype(np.float32)
+    decoded = rng.normal(500, 200, (2000, 3)).astype(np.float32)
+    budget = 8 << 20
+
+    tracemalloc.start()
+    snap_to_valid(decoded, valid, memory_bytes=budget)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Inputs copied to float64 plus the bounded distance matrices
+    assert peak < budget + 2 * valid.size * 8 + decoded.size * 8 + (1 << 20)
+def test_clean_sections_pass_through_unchanged_at_the_default_threshold():
+    pytest.importorskip("torch")
+    from timetable_pipeline.process import FINAL_CSV_PATH, MODEL_PATH
+    if not os.path.exists(MODEL_PATH):
+        pytest.skip(f"{MODEL_PATH} not available")
+    clean = pd.read_csv(FINAL_CSV_PATH, dtype={"TeacherID": str})
+
+    healed = reconstruct_anomalous_sections(clean, MODEL_PATH, valid_df=clean)
+
+    assert (healed["AnomalyScore"] <= DEFAULT_ANOMALY_THRESHOLD).all()
+    columns = ["SectionID", "SlotIndex", "SubjectCode", "TeacherID", "Block"]
+    key = ["SectionID", "SlotIndex"]
+    pd.testing.assert_frame_equal(
+        healed[columns].astype(str).sort_values(key).reset_index(drop=True),
+        clean[columns].astype(str).sort_values(key).reset_index(drop=True),
+    )
@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from timetable_pipeline.jobs import JobQueue, QueueFull
+
+
+def test_same_key_joins_the_active_job():
+    queue = JobQueue(max_workers=1)
+    release = threading.Event()
+    calls, discarded = [], []
+
+    def run(job):
+        calls.append(job.id)
+        release.wait(5)
+        return "ok"
+
+    first = queue.submit("upload-a", run)
+    second = queue.submit("upload-a", run, discard=lambda: discarded.append(True))
+    release.set()
+    queue.shutdown()
+
+    assert second is first
+    assert discarded == [True]
+    assert calls == [first.id]
+    assert first.to_dict()["status"] == "done"
+    assert first.result == "ok"
+
+
+def test_queue_is_bounded():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+    queue.submit("a", lambda job: release.wait(5))
+    queue.submit("b", lambda job: release.wait(5))
+
+    with pytest.raises(QueueFull):
+        queue.submit("c", lambda job: None)
+    assert queue.depth() == 2
+    release.set()
+    queue.shutdown()
+    assert queue.depth() == 0
+
+
+def test_failures_and_progress_are_reported():
+    queue = JobQueue(max_workers=1)
+
+    def run(job):
+        job.progress("heal")
+        raise RuntimeError("boom")
+
+    job = queue.submit("x", run, stages=["heal", "solve"])
+    queue.shutdown()
+    state = job.to_dict()
+
+    assert state["status"] == "failed"
+    assert state["error"] == "RuntimeError: boom"
+    assert [s["name"] for s in state["stages"]] == ["heal", "solve"]
+    assert state["stages"][0]["started"] is not None
+    assert queue.get(job.id) is job
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from benchmarks.synthetic import generate_room_inventory, generate_timetable
+from timetable_pipeline.rooms import allocate_rooms, build_room_inventory
+
+
+def test_allocate_rooms_without_roomable_rows_leaves_room_unset():
+    df = pd.DataFrame({
+        "SectionID": ["SEC01", "SEC01", "SEC02"],
+        "SlotIndex": [0, 1, 0],
+        "SubjectCode": ["A001", "A002", "A001"],
+        "TeacherID": ["1", "2", "3"],
+        "RoomType": ["lab", "lab", "lab"],
+        "Block": ["Unknown-Block"] * 3,
+    })
+    inventory = build_room_inventory(pd.DataFrame({"RoomID": ["R1", "R2"], "Block": ["Block-C3"] * 2}))
+    stats = {}
+
+    out = allocate_rooms(df, inventory, stats=stats)
+
+    assert out["RoomID"].isna().all()
+    assert out["SlotIndex"].tolist() == [0, 1, 0]
+    assert stats["unmapped_rows"] == 3 and stats["assigned_rows"] == 0
+
+
+def test_allocate_rooms_never_books_a_room_twice():
+    df = generate_timetable(20, seed=1)
+    inventory = build_room_inventory(generate_room_inventory(df, rooms_per_peak=0.9))
+
+    out = allocate_rooms(df, inventory, max_time_in_seconds=5)
+
+    booked = out.dropna(subset=["RoomID"])
+    assert len(booked) > 0
+    assert not booked.duplicated(subset=["RoomID", "SlotIndex"]).any()
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from timetable_pipeline.storage import TimetableDB, decode_cursor, encode_cursor
+
+
+def _timetable(rows):
+    return pd.DataFrame({
+        "SectionID": [f"SEC{i % 3:02d}" for i in range(rows)],
+        "SlotIndex": list(range(rows)),
+        "TeacherID": [f"T{i % 4}" for i in range(rows)],
+    })
+
+
+def test_cursor_round_trips_and_rejects_garbage():
+    assert decode_cursor(encode_cursor(3, 120)) == (3, 120)
+    for token in ["", "not-a-cursor", encode_cursor(0, 5), "MzotMQ"]:  # "3:-1"
+        with pytest.raises(ValueError):
+            decode_cursor(token)
+
+
+def test_pages_cover_a_version_exactly_once(tmp_path):
+    db = TimetableDB(str(tmp_path / "t.sqlite"))
+    df = _timetable(23)
+    first = db.save(df)
+
+    version, page, after = db.load_page(5)
+    pages = [page]
+    # A newer version must not change what an open cursor reads
+    db.save(_timetable(2))
+    token = encode_cursor(version, after)
+    while token is not None:
+        version, after = decode_cursor(token)
+        version, page, after = db.load_page(5, after=after, version=version)
+        pages.append(page)
+        token = None if after is None else encode_cursor(version, after)
+
+    assert version == first
+    rows = pd.concat(pages)
+    assert list(rows.index) == list(range(23))
+    pd.testing.assert_frame_equal(rows.reset_index(drop=True), df)
+
+
+def test_page_filters_use_section_index(tmp_path):
+    db = TimetableDB(str(tmp_path / "t.sqlite"))
+    db.save(_timetable(12))
+
+    _, page, after = db.load_page(10, sections=["SEC01"])
+
+    assert after is None
+    assert list(page["SlotIndex"]) == [1, 4, 7, 10]
+    assert list(page.index) == [1, 4, 7, 10]
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from timetable_pipeline.timetable import Timetable
+
+
+def _frame(slots):
+    return pd.DataFrame({"SectionID": ["SEC01"] * len(slots), "SlotIndex": slots})
+
+
+def test_from_frame_keeps_integer_slots():
+    tt = Timetable.from_frame(_frame([0, 7, 47]))
+    assert tt.frame["SlotIndex"].dtype == np.int64
+    assert tt.frame["SlotIndex"].tolist() == [0, 7, 47]
+
+
+@pytest.mark.parametrize("bad", [None, 2.5, "x"])
+def test_from_frame_rejects_missing_or_fractional_slots(bad):
+    with pytest.raises(ValueError, match="data row 2"):
+        Timetable.from_frame(_frame([0, bad, 3]))
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from timetable_pipeline.timetable import Timetable
+from timetable_pipeline.transit import repair_transit_violations
+
+TRANSIT = {
+    "block-a": {"block-b": 2, "block-c": 3},
+    "block-b": {"block-a": 2, "block-c": 1},
+    "block-c": {"block-a": 3, "block-b": 1},
+}
+
+
+def _reference_repair(df, transit_map):
+    # The original per-teacher loop the vectorized repair replaced
+    fixed = []
+    for tid in df["TeacherID"].astype(str).unique():
+        sub = df[df["TeacherID"].astype(str) == tid].sort_values("SlotIndex").reset_index(drop=True)
+        rows, shift = [], 0
+        for i in range(len(sub)):
+            row = sub.loc[i].copy()
+            if i > 0:
+                prev = rows[-1]
+                gap = row["SlotIndex"] + shift - prev["SlotIndex"]
+                required = transit_map.get(str(prev["Block"]).strip().lower(), {}).get(
+                    str(row["Block"]).strip().lower(), 0)
+                if gap < required:
+                    shift += required - gap
+            row["SlotIndex"] += shift
+            rows.append(row)
+        fixed.append(pd.DataFrame(rows))
+    final = pd.concat(fixed, ignore_index=True)
+    return final.drop_duplicates(subset=["SectionID", "SlotIndex"], keep="first")
+
+
+def _timetable(seed, rows=300):
+    rng = np.random.default_rng(seed)
+    teachers = rng.integers(0, 20, rows)
+    # One session per teacher and slot, so the slot order is unambiguous
+    slots = np.array([rng.permutation(50)[i % 50] for i in range(rows)])
+    df = pd.DataFrame({"TeacherID": [f"T{t}" for t in teachers], "SlotIndex": slots})
+    df = df.drop_duplicates(["TeacherID", "SlotIndex"]).reset_index(drop=True)
+    df["SectionID"] = [f"SEC{s:02d}" for s in rng.integers(0, 10, len(df))]
+    df["Block"] = rng.choice([" Block-A", "block-b", "BLOCK-C ", "Block-Z"], len(df))
+    return df
+
+
+def test_vectorized_repair_matches_the_reference_loop():
+    for seed in range(5):
+        df = _timetable(seed)
+        expected = _reference_repair(df, TRANSIT)
+
+        got = repair_transit_violations(df, TRANSIT)
+        pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+        # Timetable strips string columns, so compare against its normalized input
+        table = Timetable.from_frame(df)
+        expected = _reference_repair(table.to_frame(), TRANSIT).reset_index(drop=True)
+        got = repair_transit_violations(table, TRANSIT).to_frame()
+        pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+def test_repaired_sessions_respect_transit_gaps():
+    df = pd.DataFrame({
+        "TeacherID": ["T1", "T1", "T1"],
+        "SlotIndex": [0, 1, 2],
+        "SectionID": ["S1", "S2", "S3"],
+        "Block": ["block-a", "block-c", "block-b"],
+    })
+
+    got = repair_transit_violations(df, TRANSIT)
+
+    # a→c needs 3 slots, c→b needs 1: 0, 3, 4
+    assert list(got["SlotIndex"]) == [0, 3, 4]
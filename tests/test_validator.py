@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from timetable_pipeline.timetable import SLOTS_PER_WEEK
+from timetable_pipeline.validator import validate_timetable
+
+
+def _timetable(rows):
+    df = pd.DataFrame(rows, columns=["SectionID", "SlotIndex", "SubjectCode", "TeacherID"])
+    df["RoomType"] = "campus 8 (class)"
+    df["Block"] = "Block-C8"
+    return df
+
+
+def test_validator_flags_teacher_and_section_collisions():
+    df = _timetable([
+        ("A", 0, "MATH", "T1"),
+        ("B", 0, "PHY", "T1"),  # T1 teaches A and B in slot 0
+        ("B", 3, "PHY", "T2"),
+        ("B", 3, "ART", "T3"),  # B has two lessons in slot 3
+    ])
+
+    report = validate_timetable(df, transit_map={})
+
+    assert report["counts"]["teacher_double_booking"] == 1
+    assert report["counts"]["section_slot_collision"] == 1
+    assert sorted(report["issues"]["teacher_double_booking"][0]["rows"]) == [0, 1]
+    assert sorted(report["issues"]["section_slot_collision"][0]["rows"]) == [2, 3]
+
+
+def test_validator_accepts_every_slot_of_the_pipeline_week():
+    df = _timetable([("A", slot, "MATH", "T1") for slot in range(SLOTS_PER_WEEK)] + [("A", SLOTS_PER_WEEK, "MATH", "T1")])
+
+    report = validate_timetable(df, transit_map={})
+
+    assert report["counts"]["slot_out_of_range"] == 1
+    assert report["issues"]["slot_out_of_range"][0]["rows"] == [SLOTS_PER_WEEK]
+
+
+def test_validator_rejects_weeks_wider_than_its_bitsets():
+    with pytest.raises(ValueError):
+        validate_timetable(_timetable([("A", 0, "MATH", "T1")]), transit_map={}, slots_per_week=65)
@@ -0,0 +1,353 @@
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+from timetable_pipeline.formatter import DAY_NAMES, PASSTHROUGH, build_rows, entity_row_groups
+from timetable_pipeline.metrics import REGISTRY
+from timetable_pipeline.timetable import SLOTS_PER_DAY
+
+# Empty TIMETABLE_ARTIFACTS_DIR turns materialized views off
+ARTIFACTS_DIR = os.environ.get("TIMETABLE_ARTIFACTS_DIR", "data/artifacts")
+ENTITY_COLUMNS = {"section": "SectionID", "teacher": "TeacherID"}
+FORMAT_VERSION = 1  # bump when the file contents change, to rebuild everything
+DEFAULT_KEEP_VERSIONS = 5
+MIN_PARALLEL_ENTITIES = 200  # below this, spawning workers costs more than it saves
+FIRST_HOUR = 8
+
+# One materialization at a time per artifacts directory (see _out_dir_lock)
+_dir_locks = {}
+_dir_locks_guard = threading.Lock()
+
+
+def _term_start(value=None):
+    """Monday the weekly calendars repeat from (default: this week's)."""
+    if value is None:
+        value = os.environ.get("TIMETABLE_TERM_START") or datetime.date.today()
+    day = value if isinstance(value, datetime.date) else datetime.date.fromisoformat(str(value))
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def _ics_text(value):
+    text = "" if value is None or (isinstance(value, float) and np.isnan(value)) else str(value)
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_fold(line):
+    # RFC 5545: lines longer than 75 octets continue on lines starting with a space
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(raw):
+        stop = min(start + limit, len(raw))
+        while stop < len(raw) and (raw[stop] & 0xC0) == 0x80:  # don't split a UTF-8 character
+            stop -= 1
+        parts.append(raw[start:stop].decode())
+        start, limit = stop, 74
+    return "\r\n ".join(parts)
+
+
+def ics_calendar(kind, key, rows, slots, term_start):
+    """
+    Weekly-repeating iCalendar for one entity. rows are build_rows() records
+    and slots their SlotIndex values; times are floating local times, and
+    slots outside the six-day week are left out.
+    """
+    stamp = term_start.strftime("%Y%m%dT000000Z")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Smart Timetable KIIT//Timetable//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ics_text(f'{kind.title()} {key}')}",
+    ]
+    for i, (slot, row) in enumerate(zip(slots, rows)):
+        day, period = divmod(int(slot), SLOTS_PER_DAY)
+        if not 0 <= day < len(DAY_NAMES):
+            continue
+        start = datetime.datetime.combine(term_start + datetime.timedelta(days=day),
+                                          datetime.time(FIRST_HOUR + period))
+        end = start + datetime.timedelta(hours=1)
+        room, block = row.get("Room"), row["Block"]
+        where = f"{room} ({block})" if isinstance(room, str) and room else block
+        who = (f"Section {row['Section']}" if kind == "teacher"
+               else f"{row['TeacherName']} ({row['TeacherID']})")
+        summary = f"{row['Subject']} ({row['SubjectCode']}) {row['Type']}"
+        description = f"{who}, scheme {row['Scheme'] or 'NA'}"
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{_ics_text(quote(f'{kind}-{key}-{i}-{slot}', safe=''))}@smart-timetable",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start:%Y%m%dT%H%M%S}",
+            f"DTEND:{end:%Y%m%dT%H%M%S}",
+            "RRULE:FREQ=WEEKLY",
+            f"SUMMARY:{_ics_text(summary)}",
+            f"LOCATION:{_ics_text(where)}",
+            f"DESCRIPTION:{_ics_text(description)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(map(_ics_fold, lines)) + "\r\n"
+
+
+def _file_stem(key):
+    return quote(str(key), safe="")
+
+
+def _view_records(df, rows):
+    """build_rows() records (without ID) and SlotIndex values of df's rows, built in one pass."""
+    subset = df.iloc[rows]
+    records = json.loads(build_rows(subset).drop(columns="ID").to_json(orient="records"))
+    slots = pd.to_numeric(subset["SlotIndex"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    return records, slots
+
+
+def _write_entities(out_dir, term_start, tasks):
+    """Worker: write <kind>/<key>.json and .ics for each (kind, key, rows, slots) task."""
+    for kind, key, rows, slots in tasks:
+        stem = os.path.join(out_dir, kind, _file_stem(key))
+        with open(stem + ".json", "w") as f:
+            json.dump(rows, f, separators=(",", ":"))
+        with open(stem + ".ics", "w", newline="") as f:
+            f.write(ics_calendar(kind, key, rows, slots, term_start))
+    return len(tasks)
+
+
+def entity_digests(df, kind, term_start):
+    """
+    Entity key → (digest, row positions) for one kind. The digest covers
+    the entity's rows in view order, the term start and FORMAT_VERSION,
+    so equal digests mean byte-identical files.
+    """
+    column = ENTITY_COLUMNS[kind]
+    if column not in df.columns:
+        return {}
+    used = [c for c in ["SlotIndex", "RoomType", "RoomID", *(src for src, _ in PASSTHROUGH.values())]
+            if c in df.columns]
+    # One vectorized hash per row; entities then only hash their slice of it
+    row_hashes = pd.util.hash_pandas_object(df[used], index=False).to_numpy()
+    salt = f"{FORMAT_VERSION}|{term_start.isoformat()}|{','.join(used)}".encode()
+    return {
+        key: (hashlib.sha256(salt + row_hashes[rows].tobytes()).hexdigest(), rows)
+        for key, rows in entity_row_groups(df, column).items()
+    }
+
+
+def read_manifest(out_dir=ARTIFACTS_DIR, version=None):
+    """Manifest of a materialized version (default: the current one), or None."""
+    try:
+        if version is None:
+            with open(os.path.join(out_dir, "current.json")) as f:
+                version = json.load(f)["version"]
+        with open(os.path.join(out_dir, version, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+@contextmanager
+def _out_dir_lock(out_dir):
+    # A thread lock for the job workers plus a lockfile for other processes (Streamlit, the CLI)
+    path = os.path.abspath(out_dir)
+    with _dir_locks_guard:
+        lock = _dir_locks.setdefault(path, threading.Lock())
+    with lock, open(os.path.join(path, ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)  # released when f closes
+        yield
+
+
+def _version_number(version):
+    match = re.fullmatch(r"v(\d+)", str(version))
+    return int(match.group(1)) if match else None
+
+
+def _point_current(out_dir, version):
+    """
+    Move current to version unless it already points at a newer numbered
+    version; returns whether it moved.
+    """
+    manifest = read_manifest(out_dir)
+    if manifest is not None:
+        new, old = _version_number(version), _version_number(manifest["version"])
+        if new is not None and old is not None and new < old:
+            return False
+
+    # Both pointers are swapped with os.replace, so readers never see a partial switch
+    link = os.path.join(out_dir, "current")
+    tmp_link = f"{link}.{os.getpid()}.tmp"
+    try:
+        if os.path.lexists(tmp_link):
+            os.unlink(tmp_link)
+        os.symlink(version, tmp_link)
+        os.replace(tmp_link, link)
+    except OSError:
+        pass  # no symlinks here (e.g. Windows without privileges): current.json still moves
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".json.tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"version": version}, f)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, os.path.join(out_dir, "current.json"))
+    return True
+
+
+def prune_versions(out_dir=ARTIFACTS_DIR, keep=DEFAULT_KEEP_VERSIONS):
+    """Remove materialized versions beyond the newest keep, never the current one."""
+    manifest = read_manifest(out_dir)
+    current = manifest["version"] if manifest else None
+    versions = []
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name.startswith(".") or name == "current" or not os.path.isdir(path) or os.path.islink(path):
+            continue
+        number = _version_number(name)
+        versions.append((-1 if number is None else number, os.path.getmtime(path), name))
+    for *_, name in sorted(versions, reverse=True)[keep:]:
+        if name != current:
+            shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+
+
+def materialize_views(df, version, out_dir=ARTIFACTS_DIR, workers=None, term_start=None,
+                      keep_versions=DEFAULT_KEEP_VERSIONS):
+    """
+    Write per-section and per-teacher views of df to out_dir/<version>/.
+
+    Each entity gets <kind>/<key>.json (its section/teacher view rows as
+    compact JSON, without the table-wide ID) and <kind>/<key>.ics (weekly
+    events from term_start), with keys URL-quoted. Entities whose digest
+    matches the current version's manifest are hard-linked from it;
+    only changed ones are rebuilt, in a process pool of workers when there
+    are enough of them. The version directory is built under a temporary
+    name and renamed into place, then out_dir/current (symlink) and
+    out_dir/current.json move to it; a static file server can serve
+    out_dir/current/ directly. term_start defaults to the current
+    version's, else TIMETABLE_TERM_START, else this week's Monday.
+
+    Calls for the same out_dir run one at a time (across processes where
+    file locks are available), and current never moves back to a lower
+    numbered version, so publishes finishing out of order keep the newest.
+
+    Returns a summary dict (version, counts of built/reused/removed
+    entities, whether current moved, seconds).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with _out_dir_lock(out_dir):
+        return _materialize(df, version, out_dir, workers, term_start, keep_versions)
+
+
+def _materialize(df, version, out_dir, workers, term_start, keep_versions):
+    started = time.perf_counter()
+    previous = read_manifest(out_dir)
+    if term_start is None and previous is not None:
+        term_start = previous.get("term_start")
+    term_start = _term_start(term_start)
+
+    final_dir = os.path.join(out_dir, version)
+    if os.path.exists(final_dir):
+        raise FileExistsError(f"Artifacts for {version} already exist in {out_dir}")
+    tmp_dir = tempfile.mkdtemp(prefix=f".{version}-", dir=out_dir)
+
+    manifest = {"version": version, "created": time.time(), "term_start": term_start.isoformat(),
+                "format": FORMAT_VERSION, "entities": {}}
+    tasks, reused, removed = [], 0, 0
+    try:
+        for kind in ENTITY_COLUMNS:
+            os.makedirs(os.path.join(tmp_dir, kind))
+            digests = entity_digests(df, kind, term_start)
+            before = (previous or {}).get("entities", {}).get(kind, {})
+            manifest["entities"][kind] = {key: digest for key, (digest, _) in digests.items()}
+            removed += len(before.keys() - digests.keys())
+            changed = []
+            for key, (digest, rows) in digests.items():
+                if before.get(key) == digest:
+                    # ♻️ Unchanged entity: link the previous version's files
+                    for ext in (".json", ".ics"):
+                        name = os.path.join(kind, _file_stem(key) + ext)
+                        _link_or_copy(os.path.join(out_dir, previous["version"], name), os.path.join(tmp_dir, name))
+                    reused += 1
+                else:
+                    changed.append((key, rows))
+
+            # 🔧 Format every changed entity's rows at once, then slice per entity
+            if changed:
+                records, slots = _view_records(df, np.concatenate([rows for _, rows in changed]))
+                bounds = np.cumsum([0] + [len(rows) for _, rows in changed])
+                tasks += [(kind, key, records[a:b], slots[a:b])
+                          for (key, _), a, b in zip(changed, bounds[:-1], bounds[1:])]
+
+        # 🏭 Rebuild changed entities, in parallel when it pays off
+        workers = max(1, workers or os.cpu_count() or 1)
+        if workers == 1 or len(tasks) < MIN_PARALLEL_ENTITIES:
+            _write_entities(tmp_dir, term_start, tasks)
+        else:
+            batches = [tasks[i::workers * 4] for i in range(workers * 4)]
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                list(pool.map(_write_entities, [tmp_dir] * len(batches), [term_start] * len(batches), batches))
+
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+        os.chmod(tmp_dir, 0o755)  # mkdtemp creates it private; static servers need to read it
+        os.replace(tmp_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    moved = _point_current(out_dir, version)
+    prune_versions(out_dir, keep_versions)
+
+    summary = {"version": version, "dir": final_dir, "built": len(tasks), "reused": reused,
+               "removed": removed, "current": moved, "seconds": time.perf_counter() - started}
+    REGISTRY.inc("timetable_artifact_entities_total", len(tasks), help_text="Materialized views", status="built")
+    REGISTRY.inc("timetable_artifact_entities_total", reused, help_text="Materialized views", status="reused")
+    REGISTRY.observe("timetable_artifact_seconds", summary["seconds"], help_text="View materialization wall time")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from timetable_pipeline.process import open_timetable_db
+
+    parser = argparse.ArgumentParser(description="Materialize per-section/per-teacher views of a stored timetable.")
+    parser.add_argument("--version", type=int, default=None, help="stored version (default: current)")
+    parser.add_argument("--out", default=ARTIFACTS_DIR or "data/artifacts", help="artifacts directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--term-start", default=None, help="Monday the calendars start (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    db = open_timetable_db()
+    version = args.version or db.current_version()
+    if version is None:
+        parser.exit(1, "No timetable stored.\n")
+    summary = materialize_views(db.load(version=version), f"v{version}", args.out, args.workers, args.term_start)
+    print(f"✅ {summary['dir']}: {summary['built']} built, {summary['reused']} reused, "
+          f"{summary['removed']} removed in {summary['seconds']:.2f}s")
+    if not summary["current"]:
+        print("ℹ️ current still points at a newer version")
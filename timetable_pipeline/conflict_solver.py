@@ -1,68 +1,341 @@
+import time
+
+import numpy as np
 import pandas as pd
-from ortools.sat.python import cp_model
 
-def solve_teacher_conflict(df):
-    sections = df["SectionID"].unique().tolist()
+from timetable_pipeline.timetable import Timetable
+
+DEFAULT_NUM_WORKERS = 8
+DEFAULT_TIME_LIMIT = 30.0
+MAX_REPAIR_PASSES = 20
+LESSON_COLS = ["SectionID", "SlotIndex", "SubjectCode", "TeacherID"]
+METADATA_DEFAULTS = {
+    "TeacherName": "Unknown",
+    "Scheme": "NA",
+    "Subject": "Unknown",
+    "RoomType": "TBD",
+    "Block": "Unknown-Block",
+}
+
+
+def lesson_keys(df):
+    """(section, slot, subject, teacher) tuples with string-normalized fields."""
+    return set(zip(*(df[c].astype(str).str.strip() for c in LESSON_COLS)))
+
+
+def build_lesson_index(df):
+    """
+    Map (section, subject, teacher) to the metadata of its first row, in
+    METADATA_DEFAULTS order. Missing columns fall back to their default.
+    """
+    first = df.drop_duplicates(subset=["SectionID", "SubjectCode", "TeacherID"], keep="first")
+    keys = zip(first["SectionID"], first["SubjectCode"], first["TeacherID"])
+    values = zip(*(
+        first[col] if col in first.columns else [default] * len(first)
+        for col, default in METADATA_DEFAULTS.items()
+    ))
+    return dict(zip(keys, values))
+
+
+def find_changed_sections(df, previous_df):
+    """
+    Sections whose lessons differ between df and previous_df, including
+    sections that exist in only one of them.
+    """
+    def by_section(frame):
+        lessons = {}
+        for key in lesson_keys(frame):
+            lessons.setdefault(key[0], set()).add(key[1:])
+        return lessons
+
+    new, old = by_section(df), by_section(previous_df)
+    return {sec for sec in new.keys() | old.keys() if new.get(sec) != old.get(sec)}
+
+
+def find_section_components(df):
+    """
+    Group sections into connected components: two sections are linked
+    when they share a teacher. Components can be solved independently.
+    """
+    parent = {sec: sec for sec in df["SectionID"].unique()}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for _, secs in df.groupby("TeacherID", sort=False, observed=True)["SectionID"]:
+        secs = secs.unique()
+        root = find(secs[0])
+        for sec in secs[1:]:
+            parent[find(sec)] = root
+
+    components = {}
+    for sec in parent:
+        components.setdefault(find(sec), []).append(sec)
+    return list(components.values())
+
+
+def solve_component(comp_df, slots, num_search_workers=DEFAULT_NUM_WORKERS,
+                    max_time_in_seconds=DEFAULT_TIME_LIMIT, blocked=None, hints=None):
+    """
+    Re-place the lessons of one component of sections onto slots.
+
+    x[sec, (subject, teacher), slot] is 1 when that lesson runs in that
+    slot. Each section keeps its lesson counts, holds at most one lesson
+    per slot, and each teacher teaches at most one lesson per slot.
+    The objective keeps as many lessons as possible in their input slot.
+
+    blocked is a set of (teacher, slot) already taken by frozen sections;
+    hints is a set of string (section, slot, subject, teacher) keys used as
+    the solution hint instead of the input placement.
+
+    Returns (assignment, stats) where assignment maps each section to a
+    list of (slot, subject, teacher), or None if no solution was found.
+    """
+    stats = {"sections": comp_df["SectionID"].nunique(), "rows": len(comp_df)}
+    n_slots = len(slots)
+
+    # 🚫 Obviously infeasible: more lessons than slots for a section/teacher
+    if (comp_df.groupby("SectionID", observed=True).size().max() > n_slots
+            or comp_df.groupby("TeacherID", observed=True).size().max() > n_slots):
+        stats.update(status="INFEASIBLE", wall_time=0.0, branches=0, conflicts=0)
+        return None, stats
+
+    from ortools.sat.python import cp_model  # heavy; loaded only when a solve actually runs
+
+    model = cp_model.CpModel()
+    x = {}
+    by_section_slot = {}
+    by_teacher_slot = {}
+    kept = []
+
+    counts = comp_df.groupby(["SectionID", "SubjectCode", "TeacherID"], sort=False, observed=True).size()
+    original = set(zip(comp_df["SectionID"], comp_df["SubjectCode"], comp_df["TeacherID"], comp_df["SlotIndex"]))
+    blocked = blocked or set()
+
+    for (sec, subj, teach), count in counts.items():
+        lesson_vars = []
+        for slot in slots:
+            if (teach, slot) in blocked:
+                continue
+            var = model.NewBoolVar(f"x_{sec}_{subj}_{teach}_{slot}")
+            x[sec, subj, teach, slot] = var
+            lesson_vars.append(var)
+            by_section_slot.setdefault((sec, slot), []).append(var)
+            by_teacher_slot.setdefault((teach, slot), []).append(var)
+
+            in_place = (sec, subj, teach, slot) in original
+            if hints is None:
+                model.AddHint(var, in_place)
+            else:
+                model.AddHint(var, (str(sec), str(slot), str(subj), str(teach)) in hints)
+            if in_place:
+                kept.append(var)
+        if len(lesson_vars) < count:
+            stats.update(status="INFEASIBLE", wall_time=0.0, branches=0, conflicts=0)
+            return None, stats
+        model.Add(sum(lesson_vars) == int(count))
+
+    for group in (by_section_slot, by_teacher_slot):
+        for vars_ in group.values():
+            if len(vars_) > 1:
+                model.AddAtMostOne(vars_)
+
+    # 🎯 Minimize deviation from the input timetable
+    model.Maximize(sum(kept))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = num_search_workers
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    status = solver.Solve(model)
+
+    stats.update(
+        status=solver.StatusName(status),
+        wall_time=solver.WallTime(),
+        branches=solver.NumBranches(),
+        conflicts=solver.NumConflicts(),
+        moved=len(comp_df) - int(solver.ObjectiveValue()) if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+    )
+
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, stats
+
+    assignment = {}
+    for (sec, subj, teach, slot), var in x.items():
+        if solver.BooleanValue(var):
+            assignment.setdefault(sec, []).append((slot, subj, teach))
+    for lessons in assignment.values():
+        lessons.sort()
+    return assignment, stats
+
+
+def reduce_teacher_overlaps(comp_df, slots, blocked=None, max_passes=MAX_REPAIR_PASSES):
+    """
+    Fewest teacher double-bookings for a component that cannot be made
+    clash-free (e.g. a teacher has more lessons than there are slots).
+
+    Sections are re-placed one at a time: with the others fixed, placing
+    a section's lessons is an assignment problem whose cost is a
+    double-booking (a teacher already busy in that slot) first and
+    leaving the lesson's input slot second, solved exactly with OR-Tools'
+    linear sum assignment. Passes repeat until one changes nothing, so
+    every step keeps or lowers (double-bookings, moved lessons).
+
+    Returns (assignment, stats) like solve_component, with the
+    double-bookings left in stats["teacher_overlaps"].
+    """
+    from ortools.graph.python import linear_sum_assignment  # heavy; loaded only when a repair runs
+
+    stats = {"sections": comp_df["SectionID"].nunique(), "rows": len(comp_df)}
+    n_slots = len(slots)
+    slot_pos = {slot: i for i, slot in enumerate(slots)}
+    teacher_codes, teachers = pd.factorize(comp_df["TeacherID"])
+    teacher_index = {teach: t for t, teach in enumerate(teachers)}
+    input_pos = comp_df["SlotIndex"].map(slot_pos).to_numpy(dtype=np.int64)
+
+    # 👥 Lessons per (teacher, slot), frozen sections included; the last
+    # row collects lessons without a teacher, which never clash
+    busy = np.zeros((len(teachers) + 1, n_slots), dtype=np.int64)
+    has_teacher = teacher_codes >= 0
+    for teach, slot in blocked or ():
+        if teach in teacher_index and slot in slot_pos:
+            busy[teacher_index[teach], slot_pos[slot]] += 1
+
+    sections = list(comp_df.groupby("SectionID", sort=False, observed=True).indices.values())
+    if any(len(rows) > n_slots for rows in sections):
+        stats.update(status="INFEASIBLE", wall_time=0.0, teacher_overlaps=None, moved=None)
+        return None, stats
+    placed = input_pos.copy()
+    np.add.at(busy, (teacher_codes, placed), 1)
+
+    weight = n_slots + 1  # one double-booking outweighs moving every lesson of a section
+    started = time.perf_counter()
+    passes = 0
+    for passes in range(1, max_passes + 1):
+        changed = False
+        for rows in sections:
+            np.subtract.at(busy, (teacher_codes[rows], placed[rows]), 1)
+            clash = (busy[teacher_codes[rows]] > 0) & has_teacher[rows, None]
+            cost = weight * clash + (np.arange(n_slots) != input_pos[rows, None])
+            left, right = np.divmod(np.arange(cost.size), n_slots)
+            solver = linear_sum_assignment.SimpleLinearSumAssignment()
+            solver.add_arcs_with_cost(left, right, cost.ravel())
+            # Pad with free dummy lessons so every slot is matched
+            pad = n_slots - len(rows)
+            if pad:
+                dummy_left, dummy_right = np.divmod(np.arange(pad * n_slots), n_slots)
+                solver.add_arcs_with_cost(dummy_left + len(rows), dummy_right, np.zeros(pad * n_slots, dtype=np.int64))
+            solver.solve()
+            new = np.array([solver.right_mate(i) for i in range(len(rows))], dtype=np.int64)
+            current = cost[np.arange(len(rows)), placed[rows]].sum()
+            if cost[np.arange(len(rows)), new].sum() < current:
+                placed[rows] = new
+                changed = True
+            np.add.at(busy, (teacher_codes[rows], placed[rows]), 1)
+        if not changed:
+            break
+
+    assignment = {}
+    slot_values = np.asarray(slots, dtype=object)[placed]
+    for sec, subj, teach, slot in zip(comp_df["SectionID"], comp_df["SubjectCode"], comp_df["TeacherID"], slot_values):
+        assignment.setdefault(sec, []).append((slot, subj, teach))
+    for lessons in assignment.values():
+        lessons.sort()
+    stats.update(
+        status="REPAIRED",
+        wall_time=time.perf_counter() - started,
+        passes=passes,
+        moved=int((placed != input_pos).sum()),
+        teacher_overlaps=int(np.maximum(busy[:-1] - 1, 0).sum()),
+    )
+    return assignment, stats
+
+
+def input_placement(df):
+    placement = {}
+    for sec, slot, subj, teach in df[LESSON_COLS].itertuples(index=False, name=None):
+        placement.setdefault(sec, []).append((slot, subj, teach))
+    return placement
+
+
+def solve_teacher_conflict(df, num_search_workers=DEFAULT_NUM_WORKERS,
+                           max_time_in_seconds=DEFAULT_TIME_LIMIT, solver_stats=None,
+                           previous_df=None):
+    """
+    Remove teacher double-bookings with CP-SAT.
+
+    Sections are split into components that share teachers and each
+    component is solved as one model. Components with no clash-free
+    re-placement (or that hit the time limit) are repaired with
+    reduce_teacher_overlaps instead, which leaves as few double-bookings
+    as possible; stats["repair"] records how many remain. Per-component
+    solver statistics are appended to solver_stats if given.
+
+    With previous_df (the last solved timetable), only sections that
+    changed and sections sharing a teacher with them are re-solved, hinted
+    with their previous placement; all other sections are kept frozen.
+
+    Accepts a DataFrame or a Timetable and returns the same kind.
+    """
+    timetable = df if isinstance(df, Timetable) else None
+    if timetable is not None:
+        df = timetable.frame
     slots = sorted(df["SlotIndex"].unique())
-    teachers = df["TeacherID"].unique().tolist()
-    subjects = df["SubjectCode"].unique().tolist()
-    T, S = len(teachers), len(subjects)
+    sections = df["SectionID"].unique().tolist()
 
-    teacher_map = {t: i for i, t in enumerate(teachers)}
-    subject_map = {s: i for i, s in enumerate(subjects)}
+    free_df, hints = df, None
+    assignment = {}
+    if previous_df is not None:
+        changed = find_changed_sections(df, previous_df)
+        section_str = df["SectionID"].astype(str).str.strip()
+        teacher_str = df["TeacherID"].astype(str).str.strip()
+        prev_sections = previous_df["SectionID"].astype(str).str.strip()
+        touched = set(teacher_str[section_str.isin(changed)]) | set(
+            previous_df["TeacherID"].astype(str).str.strip()[prev_sections.isin(changed)]
+        )
+        free = section_str.isin(changed) | section_str.isin(set(section_str[teacher_str.isin(touched)]))
 
-    all_section_dfs = []
+        # 🧊 Freeze untouched sections; their teacher slots stay occupied
+        frozen_df = df[~free]
+        assignment.update(input_placement(frozen_df))
+        blocked = set(zip(frozen_df["TeacherID"], frozen_df["SlotIndex"]))
+        free_df, hints = df[free], lesson_keys(previous_df)
+    else:
+        blocked = None
 
+    for comp_sections in find_section_components(free_df):
+        comp_df = free_df[free_df["SectionID"].isin(comp_sections)]
+        solved, stats = solve_component(
+            comp_df, slots, num_search_workers, max_time_in_seconds, blocked=blocked, hints=hints
+        )
+        if solved is None:
+            # 🩹 No clash-free placement: leave as few double-bookings as possible
+            solved, repair_stats = reduce_teacher_overlaps(comp_df, slots, blocked=blocked)
+            if solved is None:
+                solved = input_placement(comp_df)  # ↩️ a section has more lessons than slots
+            stats["repair"] = repair_stats
+        else:
+            stats["teacher_overlaps"] = 0
+        assignment.update(solved)
+        if solver_stats is not None:
+            solver_stats.append(stats)
+
+    # 🗂️ (section, subject, teacher) → first matching row's metadata
+    lesson_meta = build_lesson_index(df)
+    default_meta = tuple(METADATA_DEFAULTS.values())
+
+    columns = {col: [] for col in ["SectionID", "SlotIndex", "SubjectCode", "TeacherID", *METADATA_DEFAULTS]}
+    meta_columns = [columns[col] for col in METADATA_DEFAULTS]
     for sec in sections:
-        model = cp_model.CpModel()
-        X = {slot: model.NewIntVar(0, T * S - 1, f"x_{sec}_{slot}") for slot in slots}
-        model.AddAllDifferent(list(X.values()))
-
-        solver = cp_model.CpSolver()
-        status = solver.Solve(model)
-
-        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-            output = []
-            for slot in slots:
-                val = solver.Value(X[slot])
-                t_idx, s_idx = divmod(val, S)
-                teacher = teachers[t_idx]
-                subject = subjects[s_idx]
-
-                # Match back to original row for context
-                original_match = df[
-                    (df["SectionID"] == sec) &
-                    (df["SubjectCode"] == subject) &
-                    (df["TeacherID"] == teacher)
-                ]
-
-                if not original_match.empty:
-                    row = original_match.iloc[0]
-                    scheme = row.get("Scheme", "NA")
-                    subject_name = row.get("Subject", "Unknown")
-                    roomtype = row.get("RoomType", "TBD")
-                    block = row.get("Block", "Unknown-Block")
-                    teacher_name = row.get("TeacherName", "Unknown")
-                else:
-                    scheme = "NA"
-                    subject_name = "Unknown"
-                    roomtype = "TBD"
-                    block = "Unknown-Block"
-                    teacher_name = "Unknown"
-
-                output.append({
-                    "SectionID": sec,
-                    "SlotIndex": slot,
-                    "SubjectCode": subject,
-                    "TeacherID": teacher,
-                    "TeacherName": teacher_name,
-                    "Scheme": scheme,
-                    "Subject": subject_name,
-                    "RoomType": roomtype,
-                    "Block": block
-                })
-
-            result_df = pd.DataFrame(output)
-            all_section_dfs.append(result_df)
-
-    return pd.concat(all_section_dfs, ignore_index=True)
+        for slot, subject, teacher in assignment.get(sec, []):
+            columns["SectionID"].append(sec)
+            columns["SlotIndex"].append(slot)
+            columns["SubjectCode"].append(subject)
+            columns["TeacherID"].append(teacher)
+            for values, value in zip(meta_columns, lesson_meta.get((sec, subject, teacher), default_meta)):
+                values.append(value)
+
+    result = pd.DataFrame(columns)
+    return Timetable.from_frame(result, like=timetable) if timetable is not None else result
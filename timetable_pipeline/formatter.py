@@ -1,57 +1,119 @@
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
 
-# 🔧 Human-readable row builder
-def build_row(row, idx):
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
-    
-    try:
-        slot = int(row.get("SlotIndex", 0))
-    except:
-        slot = 0
-
-    day = day_names[slot // 8] if 0 <= slot // 8 < len(day_names) else "Unknown"
-    start = 8 + (slot % 8)
-    end = start + 1
-    time = f"{start}:00 - {end}:00"
-
-    room_type = str(row.get("RoomType", "")).strip().lower()
-    class_type = "Lab" if "lab" in room_type else "Theory"
-
-    return {
-        "ID": idx + 1,
-        "Section": row.get("SectionID", "NA"),
-        "Day": day,
-        "Time": time,
-        "SubjectCode": row.get("SubjectCode", "NA"),
-        "Subject": row.get("Subject", "Unknown"),
-        "TeacherID": row.get("TeacherID", "NA"),
-        "TeacherName": row.get("TeacherName", "Unknown Faculty"),
-        "Scheme": row.get("Scheme", "NA"),
-        "RoomType": row.get("RoomType", "NA"),
-        "Block": row.get("Block", "Unknown-Block"),
-        "Type": class_type
-    }
+from timetable_pipeline.timetable import SLOTS_PER_DAY
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+# Readable column → (source column, default when the source is missing)
+PASSTHROUGH = {
+    "Section": ("SectionID", "NA"),
+    "SubjectCode": ("SubjectCode", "NA"),
+    "Subject": ("Subject", "Unknown"),
+    "TeacherID": ("TeacherID", "NA"),
+    "TeacherName": ("TeacherName", "Unknown Faculty"),
+    "Scheme": ("Scheme", "NA"),
+    "RoomType": ("RoomType", "NA"),
+    "Block": ("Block", "Unknown-Block"),
+}
+COLUMNS = ["ID", "Section", "Day", "Time", "SubjectCode", "Subject", "TeacherID",
+           "TeacherName", "Scheme", "RoomType", "Block", "Type"]
+
+# Formatted frame sorted by one entity column, with row bounds per entity
+EntityIndex = namedtuple("EntityIndex", ["frame", "bounds"])
+
+# 🔧 Human-readable columns, derived with array operations
+def build_rows(df: pd.DataFrame) -> pd.DataFrame:
+    n = len(df)
+
+    if "SlotIndex" in df.columns:
+        slot = pd.to_numeric(df["SlotIndex"], errors="coerce").fillna(0).to_numpy().astype(np.int64)
+    else:
+        slot = np.zeros(n, dtype=np.int64)
+
+    day_idx = slot // SLOTS_PER_DAY
+    day_lookup = np.array(DAY_NAMES + ["Unknown"], dtype=object)
+    day = day_lookup[np.where((day_idx >= 0) & (day_idx < len(DAY_NAMES)), day_idx, len(DAY_NAMES))]
+    start = (8 + slot % SLOTS_PER_DAY).astype(str).astype(object)
+    end = (9 + slot % SLOTS_PER_DAY).astype(str).astype(object)
+    time = start + ":00 - " + end + ":00"
+
+    if "RoomType" in df.columns:
+        is_lab = df["RoomType"].astype(str).str.strip().str.lower().str.contains("lab", regex=False).to_numpy()
+    else:
+        is_lab = np.zeros(n, dtype=bool)
+
+    index = df.index.to_numpy()
+    ids = index + 1 if np.issubdtype(index.dtype, np.integer) else np.arange(1, n + 1)
+
+    columns = {"ID": ids, "Day": day, "Time": time, "Type": np.where(is_lab, "Lab", "Theory")}
+    for name, (source, default) in PASSTHROUGH.items():
+        columns[name] = df[source].to_numpy() if source in df.columns else np.full(n, default, dtype=object)
+
+    rows = pd.DataFrame({col: columns[col] for col in COLUMNS})
+    # 🚪 Concrete room, once the pipeline has assigned rooms
+    if "RoomID" in df.columns:
+        rows.insert(rows.columns.get_loc("Block") + 1, "Room", df["RoomID"].to_numpy())
+    return rows
+
+def _entity_keys(df: pd.DataFrame, column: str) -> pd.Series:
+    return df[column].astype(str).str.strip().where(df[column].notna())
+
+def _grouped_order(keys: pd.Series) -> np.ndarray:
+    # Rows grouped by key in order of first appearance, original order within
+    codes, _ = pd.factorize(keys)
+    rows = np.flatnonzero(codes >= 0)
+    return rows[np.argsort(codes[rows], kind="stable")]
 
 # 📋 Admin full view
 def format_admin_view(df: pd.DataFrame) -> pd.DataFrame:
-    data = [build_row(row, i) for i, row in df.iterrows()]
-    return pd.DataFrame(data)
-
-# 📋 Section-wise view
-def format_section_view(df: pd.DataFrame) -> pd.DataFrame:
-    result = []
-    for sid in df["SectionID"].dropna().unique():
-        filtered = df[df["SectionID"] == sid]
-        result.extend([build_row(row, i) for i, row in filtered.iterrows()])
-    return pd.DataFrame(result)
-
-# 📋 Teacher-wise view
-def format_teacher_view(df: pd.DataFrame) -> pd.DataFrame:
-    result = []
-    for tid in df["TeacherID"].dropna().astype(str).unique():
-        filtered = df[df["TeacherID"].astype(str) == str(tid)]
-        result.extend([build_row(row, i) for i, row in filtered.iterrows()])
-    return pd.DataFrame(result)
+    rows = build_rows(df)
+    # 🩺 Coordinators see each section's healing anomaly score
+    if "AnomalyScore" in df.columns:
+        rows["AnomalyScore"] = df["AnomalyScore"].to_numpy()
+    return rows
+
+def _format_entity_view(df: pd.DataFrame, column: str, key=None) -> pd.DataFrame:
+    if column not in df.columns:
+        return build_rows(df.iloc[0:0])
+    keys = _entity_keys(df, column)
+    if key is not None:
+        return build_rows(df[keys == str(key).strip()])
+    return build_rows(df.iloc[_grouped_order(keys)])
+
+# 📋 Section-wise view (all sections, or one section)
+def format_section_view(df: pd.DataFrame, section_id=None) -> pd.DataFrame:
+    return _format_entity_view(df, "SectionID", section_id)
+
+# 📋 Teacher-wise view (all teachers, or one teacher)
+def format_teacher_view(df: pd.DataFrame, teacher_id=None) -> pd.DataFrame:
+    return _format_entity_view(df, "TeacherID", teacher_id)
+
+def _entity_groups(df: pd.DataFrame, column: str):
+    # (row order of the entity views, key of each group, start of each group within that order)
+    keys = _entity_keys(df, column)
+    order = _grouped_order(keys)
+    sorted_keys = keys.to_numpy()[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) if len(order) else order
+    return order, sorted_keys[starts], starts
+
+# 🗂️ Pre-sorted views for repeated single-entity lookups
+def build_entity_index(df: pd.DataFrame, column: str) -> EntityIndex:
+    order, group_keys, starts = _entity_groups(df, column)
+    stops = np.r_[starts[1:], len(order)]
+    bounds = {key: (s, e) for key, s, e in zip(group_keys, starts, stops)}
+    return EntityIndex(build_rows(df.iloc[order]), bounds)
+
+def entity_row_groups(df: pd.DataFrame, column: str) -> dict:
+    """Entity key → positions of its rows, in the order its view lists them."""
+    order, group_keys, starts = _entity_groups(df, column)
+    return dict(zip(group_keys, np.split(order, starts[1:]))) if len(order) else {}
+
+def lookup_entity(index: EntityIndex, key) -> pd.DataFrame:
+    start, stop = index.bounds.get(str(key).strip(), (0, 0))
+    return index.frame.iloc[start:stop].reset_index(drop=True)
 
 # 🔁 Dispatcher
 def format_output(df: pd.DataFrame, mode: str = "admin") -> pd.DataFrame:
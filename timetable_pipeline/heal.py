@@ -1,108 +1,274 @@
-import torch
 import numpy as np
 import pandas as pd
-from timetable_pipeline.model import load_model
+from timetable_pipeline.timetable import SLOTS_PER_WEEK, Timetable
 
-def reconstruct_anomalous_sections(df, model_path, valid_tuples=None, valid_df=None, max_len=50):
-    model = load_model(model_path)
-    reconstructed_rows = []
+KEY_COLS = ["SubjectCode", "TeacherID", "Block"]
+META_COLS = ["Scheme", "Subject", "RoomType"]
+DEFAULT_BATCH_SIZE = 64
+# Sections whose mean scaled reconstruction error is at or below this are
+# considered clean and pass through healing unchanged. Calibrated with
+# calibrate_anomaly_threshold on data/final_transit_fixed.csv for the
+# shipped checkpoint, whose clean sections score 0.38-0.63.
+DEFAULT_ANOMALY_THRESHOLD = 0.65
+CALIBRATION_MARGIN = 0.02
+SNAP_MEMORY_BYTES = 64 << 20  # distance matrix budget per snap_to_valid chunk
+SCORE_COLS = ["AnomalyScore", "SlotAnomalyScore"]
 
-    # 🔄 Normalize key string fields
-    for col in ["SubjectCode", "TeacherID", "Block"]:
-        df[col] = df[col].astype(str).str.strip()
 
-    # 1️⃣ Encode categorical values
-    encoded_df = df.copy()
-    subject_map = {val: i for i, val in enumerate(encoded_df["SubjectCode"].unique())}
-    teacher_map = {val: i for i, val in enumerate(encoded_df["TeacherID"].unique())}
-    block_map = {val: i for i, val in enumerate(encoded_df["Block"].unique())}
+def snap_to_valid(decoded, valid_arr, memory_bytes=SNAP_MEMORY_BYTES):
+    """
+    Return, for every decoded row, the index of the nearest valid tuple
+    (Euclidean distance). Rows are processed in chunks sized so the
+    (rows x tuples) distance matrices stay within about memory_bytes,
+    however many valid tuples there are.
 
-    inv_subject_map = {v: k for k, v in subject_map.items()}
-    inv_teacher_map = {v: k for k, v in teacher_map.items()}
-    inv_block_map = {v: k for k, v in block_map.items()}
+    The expansion below subtracts terms that grow with the square of the
+    IDs, so it runs in float64; float32 picks the wrong tuple once teacher
+    IDs reach the thousands.
+    """
+    decoded = np.asarray(decoded, dtype=np.float64)
+    valid_arr = np.asarray(valid_arr, dtype=np.float64)
+    valid_sq = (valid_arr ** 2).sum(axis=1)
+    # Two float64 (rows x tuples) temporaries live at once: the product and the distances
+    chunk_size = max(1, memory_bytes // (2 * 8 * max(1, len(valid_arr))))
 
-    encoded_df["SubjectCode"] = encoded_df["SubjectCode"].map(subject_map)
-    encoded_df["TeacherID"] = encoded_df["TeacherID"].map(teacher_map)
-    encoded_df["Block"] = encoded_df["Block"].map(block_map)
+    nearest = np.empty(len(decoded), dtype=np.int64)
+    for start in range(0, len(decoded), chunk_size):
+        chunk = decoded[start:start + chunk_size]
+        # ||a - b||² = ||a||² - 2a·b + ||b||² (||a||² is constant per row)
+        dist = valid_sq[None, :] - 2.0 * chunk @ valid_arr.T
+        nearest[start:start + chunk_size] = dist.argmin(axis=1)
+    return nearest
 
-    # 2️⃣ Create encoded valid tuples
-    valid_tuples = list(
-        encoded_df[["SubjectCode", "TeacherID", "Block"]]
-        .drop_duplicates()
-        .itertuples(index=False, name=None)
+
+def build_metadata_index(valid_df):
+    """
+    Prebuild hash indexes for the three-tier metadata fallback:
+    (subject, teacher, block) → (subject, teacher) → subject.
+    Each index keeps the first matching row, like match.iloc[0] did.
+    """
+    meta_cols = [c for c in META_COLS if c in valid_df.columns]
+    tiers = []
+    for keys in (KEY_COLS, KEY_COLS[:2], KEY_COLS[:1]):
+        first = valid_df.drop_duplicates(subset=keys, keep="first")
+        key_iter = zip(*(first[k] for k in keys)) if len(keys) > 1 else first[keys[0]]
+        values = list(zip(*(first[c] for c in meta_cols))) if meta_cols else [()] * len(first)
+        tiers.append({key: dict(zip(meta_cols, vals)) for key, vals in zip(key_iter, values)})
+    return tiers
+
+
+def lookup_metadata(tiers, subj, teach, block):
+    full, subj_teach, subj_only = tiers
+    return (
+        full.get((subj, teach, block))
+        or subj_teach.get((subj, teach))
+        or subj_only.get(subj)
     )
 
+
+def decode_sections(model, sequences, max_len=SLOTS_PER_WEEK, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Run the autoencoder over many sections in batched forward passes.
+
+    Each section is zero-padded to max(len, max_len), exactly as a single
+    (1, max_len, 3) call would see it, so sections longer than max_len are
+    decoded in full instead of being truncated. Sections are bucketed by
+    padded length and decoded batch_size at a time. torch's thread count
+    is process-wide and set once at startup (see model.warm_up), not here.
+    """
+    import torch  # heavy; loaded only when a heal actually runs
+
+    padded_lens = [max(len(x), max_len) for x in sequences]
+    outputs = [None] * len(sequences)
+
+    for length in sorted(set(padded_lens)):
+        bucket = [i for i, n in enumerate(padded_lens) if n == length]
+        for start in range(0, len(bucket), batch_size):
+            chunk = bucket[start:start + batch_size]
+            batch = np.zeros((len(chunk), length, 3), dtype=np.float32)
+            for j, i in enumerate(chunk):
+                batch[j, :len(sequences[i])] = sequences[i]
+
+            with torch.inference_mode():
+                out = model(torch.from_numpy(batch), torch.empty(len(chunk), 0)).numpy()
+            for j, i in enumerate(chunk):
+                outputs[i] = out[j]
+    return outputs
+
+
+def reconstruction_errors(sequences, decoded, scale):
+    """
+    Per-row reconstruction error of each section: RMS over the key columns
+    of (decoded - input) / scale, where scale is each column's id range.
+    Decoded padding rows beyond the section's length are not scored.
+    """
+    return [
+        np.sqrt((((out[:len(seq)] - seq) / scale) ** 2).mean(axis=1))
+        for seq, out in zip(sequences, decoded)
+    ]
+
+
+def _snapped_rows(decoded, valid_arr, inverse, metadata_index):
+    """Snap decoded rows to valid tuples and attach their metadata."""
+    nearest = valid_arr[snap_to_valid(decoded, valid_arr)].astype(int)
+    subjects, teachers, blocks = (inverse[j][nearest[:, j]] for j in range(len(KEY_COLS)))
+
+    # 🧠 Full match → Subject + Teacher → Subject only → default
+    schemes, subject_names, roomtypes = [], [], []
+    for subj, teach, block in zip(subjects, teachers, blocks):
+        meta = lookup_metadata(metadata_index, subj, teach, block) or {}
+        schemes.append(meta.get("Scheme", "NA"))
+        subject_names.append(meta.get("Subject", subj))
+        roomtypes.append(meta.get("RoomType", "TBD"))
+
+    return {
+        "SubjectCode": subjects,
+        "TeacherID": teachers,
+        "Block": blocks,
+        "Scheme": schemes,
+        "Subject": subject_names,
+        "RoomType": roomtypes,
+    }
+
+
+def reconstruct_anomalous_sections(df, model_path, valid_tuples=None, valid_df=None, max_len=SLOTS_PER_WEEK,
+                                   batch_size=DEFAULT_BATCH_SIZE,
+                                   threshold=DEFAULT_ANOMALY_THRESHOLD, row_threshold=None):
+    """
+    Score every section in one batched autoencoder pass and rebuild only
+    the anomalous ones.
+
+    SlotAnomalyScore is a row's reconstruction error (see
+    reconstruction_errors) and AnomalyScore its section's mean. Sections
+    scoring at or below threshold pass through unchanged; threshold=None
+    rebuilds every section. An anomalous section is replaced by its
+    snapped reconstruction, or, with row_threshold set, only its rows
+    scoring above row_threshold are replaced in place.
+    """
+    from timetable_pipeline.model import get_model  # pulls in torch
+
+    model = get_model(model_path)
+
+    # 🔄 Normalize + intern key string fields once
+    as_timetable = isinstance(df, Timetable)
+    tt = Timetable.from_frame(df)
+
+    # 1️⃣ Encode categorical values (ids in order of first appearance)
+    encoded = np.zeros((len(tt), len(KEY_COLS)), dtype=np.float32)
+    inverse = []
+    for j, col in enumerate(KEY_COLS):
+        ids, uniques = pd.factorize(tt.codes(col))
+        encoded[:, j] = ids
+        # Missing values (code -1) decode as "nan", as astype(str) did
+        inverse.append(np.append(tt.categories(col).to_numpy(dtype=object), "nan")[uniques])
+    scale = np.maximum(1, [len(values) - 1 for values in inverse]).astype(np.float32)
+
+    # 2️⃣ Create encoded valid tuples
+    valid_arr = pd.DataFrame(encoded).drop_duplicates().to_numpy(dtype=np.float32).reshape(-1, 3)
+
     # 🔒 Ensure valid_df is present and normalized
     if valid_df is None:
         raise ValueError("valid_df is required for contextual reconstruction.")
 
-    for col in ["SubjectCode", "TeacherID", "Block"]:
-        valid_df[col] = valid_df[col].astype(str).str.strip()
-
-    # 3️⃣ Section-wise reconstruction
-    for section in encoded_df["SectionID"].unique():
-        sub_df = encoded_df[encoded_df["SectionID"] == section]
-        x = sub_df[["SubjectCode", "TeacherID", "Block"]].astype(np.float32).values
-
-        # Padding if required
-        if len(x) < max_len:
-            pad = np.zeros((max_len - len(x), 3), dtype=np.float32)
-            x = np.vstack([x, pad])
-        else:
-            x = x[:max_len]
-
-        x_tensor = torch.tensor(x, dtype=torch.float32).unsqueeze(0)
-        p = torch.empty(1, 0)
-
-        with torch.no_grad():
-            out = model(x_tensor, p).squeeze(0).numpy()
-
-        for i, decoded in enumerate(out):
-            best = min(valid_tuples, key=lambda v: np.linalg.norm(decoded - np.array(v)))
-            subj_idx, teach_idx, block_idx = best
-
-            subj = inv_subject_map.get(subj_idx, "NA")
-            teach = inv_teacher_map.get(teach_idx, "NA")
-            block = inv_block_map.get(block_idx, "Unknown")
-
-            # 🧠 Try full match
-            match = valid_df[
-                (valid_df["SubjectCode"] == subj) &
-                (valid_df["TeacherID"] == teach) &
-                (valid_df["Block"] == block)
-            ]
-
-            # 🔁 Fallback: Subject + Teacher
-            if match.empty:
-                match = valid_df[
-                    (valid_df["SubjectCode"] == subj) &
-                    (valid_df["TeacherID"] == teach)
-                ]
-
-            # 🔁 Fallback: Subject only
-            if match.empty:
-                match = valid_df[valid_df["SubjectCode"] == subj]
-
-            # 🪙 Final default if nothing matches
-            if not match.empty:
-                row = match.iloc[0]
-                scheme = row.get("Scheme", "NA")
-                subject = row.get("Subject", subj)
-                roomtype = row.get("RoomType", "TBD")
-            else:
-                scheme = "NA"
-                subject = subj
-                roomtype = "TBD"
-
-            reconstructed_rows.append({
-                "SectionID": section,
-                "SlotIndex": i,
-                "SubjectCode": subj,
-                "TeacherID": teach,
-                "Block": block,
-                "Scheme": scheme,
-                "Subject": subject,
-                "RoomType": roomtype
+    metadata_index = build_metadata_index(Timetable.from_frame(valid_df).frame)
+
+    # 3️⃣ Section-wise scoring (one batched forward pass)
+    section_ids, section_uniques = pd.factorize(tt.codes("SectionID"))
+    rows = np.flatnonzero(section_uniques[section_ids] >= 0)
+    rows = rows[np.argsort(section_ids[rows], kind="stable")]
+    bounds = np.flatnonzero(np.diff(section_ids[rows])) + 1
+    sequences = np.split(encoded[rows], bounds) if len(rows) else []
+    section_rows = np.split(rows, bounds) if len(rows) else []
+    sections = tt.categories("SectionID").to_numpy(dtype=object)[section_uniques[section_uniques >= 0]]
+    decoded_chunks = decode_sections(
+        model, sequences, max_len=max_len, batch_size=batch_size
+    )
+
+    columns = ["SectionID", "SlotIndex"] + KEY_COLS + META_COLS + SCORE_COLS
+    if not decoded_chunks:
+        healed = pd.DataFrame(columns=columns)
+        return Timetable.from_frame(healed, like=tt) if as_timetable else healed
+
+    errors = reconstruction_errors(sequences, decoded_chunks, scale)
+    section_scores = np.array([err.mean() for err in errors])
+    anomalous = np.ones(len(sections), dtype=bool) if threshold is None else section_scores > threshold
+
+    # 🚦 Rows kept as-is: clean sections, plus unflagged rows in row mode
+    keep = [
+        np.ones(len(err), dtype=bool) if not bad
+        else (err <= row_threshold) if row_threshold is not None
+        else np.zeros(len(err), dtype=bool)
+        for err, bad in zip(errors, anomalous)
+    ]
+    position = np.concatenate([np.arange(len(err)) for err in errors])
+    rank = np.repeat(np.arange(len(sections)), [len(err) for err in errors])
+    row_scores = np.concatenate(errors)
+    kept = np.concatenate(keep)
+
+    passthrough = tt.take(rows[kept]).to_frame().reindex(columns=columns[:-2])
+    passthrough["AnomalyScore"] = section_scores[rank[kept]]
+    passthrough["SlotAnomalyScore"] = row_scores[kept]
+    parts = [(passthrough, rank[kept], position[kept])]
+
+    # 4️⃣ Snap every replaced row to its nearest valid tuple in one batch
+    if row_threshold is not None:
+        replaced = ~kept
+        if replaced.any():
+            decoded = np.vstack([out[:len(k)][~k] for out, k in zip(decoded_chunks, keep)])
+            rebuilt = pd.DataFrame({
+                "SectionID": sections[rank[replaced]],
+                "SlotIndex": tt.frame["SlotIndex"].to_numpy()[rows[replaced]],
+                **_snapped_rows(decoded, valid_arr, inverse, metadata_index),
+                "AnomalyScore": section_scores[rank[replaced]],
+                "SlotAnomalyScore": row_scores[replaced],
             })
+            parts.append((rebuilt, rank[replaced], position[replaced]))
+    elif anomalous.any():
+        chunks = [out for out, bad in zip(decoded_chunks, anomalous) if bad]
+        lengths = [len(out) for out in chunks]
+        # Decoded padding rows beyond the input length carry no slot score
+        slot_scores = np.concatenate([
+            np.r_[err, np.full(len(out) - len(err), np.nan)]
+            for out, err, bad in zip(decoded_chunks, errors, anomalous) if bad
+        ])
+        rebuilt = pd.DataFrame({
+            "SectionID": np.repeat(sections[anomalous], lengths),
+            "SlotIndex": np.concatenate([np.arange(n) for n in lengths]),
+            **_snapped_rows(np.vstack(chunks), valid_arr, inverse, metadata_index),
+            "AnomalyScore": np.repeat(section_scores[anomalous], lengths),
+            "SlotAnomalyScore": slot_scores,
+        })
+        parts.append((rebuilt, np.repeat(np.flatnonzero(anomalous), lengths),
+                      np.concatenate([np.arange(n) for n in lengths])))
+
+    # 🧩 Reassemble in section order, rows in their original order
+    healed = pd.concat([part for part, _, _ in parts], ignore_index=True)[columns]
+    order = np.lexsort((np.concatenate([p for _, _, p in parts]), np.concatenate([r for _, r, _ in parts])))
+    healed = healed.iloc[order].reset_index(drop=True)
+    return Timetable.from_frame(healed, like=tt) if as_timetable else healed
+
+
+def calibrate_anomaly_threshold(clean_df, model_path, margin=CALIBRATION_MARGIN):
+    """
+    Anomaly threshold for a checkpoint: the highest section score on a
+    timetable known to be clean, plus margin, so every clean section
+    passes through healing unchanged.
+    """
+    scored = reconstruct_anomalous_sections(clean_df, model_path, valid_df=clean_df, threshold=np.inf)
+    frame = scored.frame if isinstance(scored, Timetable) else scored
+    return float(frame["AnomalyScore"].max()) + margin
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from timetable_pipeline.process import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Calibrate the anomaly threshold on a clean timetable.")
+    parser.add_argument("clean_csv", help="timetable known to need no healing")
+    parser.add_argument("--model", default=MODEL_PATH, help="checkpoint or exported .ts model")
+    parser.add_argument("--margin", type=float, default=CALIBRATION_MARGIN)
+    args = parser.parse_args()
 
-    return pd.DataFrame(reconstructed_rows)
+    threshold = calibrate_anomaly_threshold(pd.read_csv(args.clean_csv), args.model, args.margin)
+    print(f"✅ anomaly threshold: {threshold:.3f} (set DEFAULT_ANOMALY_THRESHOLD or pass anomaly_threshold)")
@@ -0,0 +1,71 @@
+import pandas as pd
+
+from timetable_pipeline.timetable import STRING_COLUMNS, Timetable, integer_slots
+
+# Columns run_full_pipeline reads from an uploaded timetable
+REQUIRED_COLUMNS = ["SectionID", "SlotIndex", "SubjectCode", "TeacherID", "RoomType", "Block"]
+CHUNK_ROWS = 50_000
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def check_header(columns, required=REQUIRED_COLUMNS):
+    """Raise SchemaError if required columns are missing or names repeat."""
+    columns = [str(c).strip() for c in columns]
+    missing = [c for c in required if c not in columns]
+    if missing:
+        raise SchemaError(f"Timetable is missing required columns: {', '.join(missing)}")
+    repeated = sorted({c for c in columns if columns.count(c) > 1})
+    if repeated:
+        raise SchemaError(f"Timetable has repeated columns: {', '.join(repeated)}")
+    return columns
+
+
+def read_header(source, required=REQUIRED_COLUMNS):
+    """Read and check only the header line of a CSV (path or file object)."""
+    try:
+        columns = pd.read_csv(source, nrows=0).columns
+    except pd.errors.EmptyDataError:
+        raise SchemaError("Timetable CSV is empty") from None
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
+    return check_header(columns, required)
+
+
+def _typed_slots(chunk, first_row):
+    return integer_slots(chunk["SlotIndex"], first_row, SchemaError)
+
+
+def read_timetable_csv(source, chunk_rows=CHUNK_ROWS, required=REQUIRED_COLUMNS):
+    """
+    Read a timetable CSV into a Timetable, chunk_rows rows at a time.
+
+    The header is checked before any row is parsed. String columns are
+    read as strings (IDs like 007 keep their zeros) and interned per chunk
+    into categoricals sharing one vocabulary, so only integer codes are
+    kept between chunks; SlotIndex must be an integer in every row, and
+    the first bad chunk stops the read with a SchemaError.
+    """
+    columns = read_header(source, required)
+    dtype = {c: str for c in columns if c in STRING_COLUMNS}
+    reader = pd.read_csv(source, names=columns, header=0, dtype=dtype, chunksize=chunk_rows)
+
+    parts, vocab, first_row = [], None, 0
+    with reader:
+        for chunk in reader:
+            chunk["SlotIndex"] = _typed_slots(chunk, first_row)
+            vocab = Timetable.from_frame(chunk, like=vocab)
+            parts.append(vocab.frame)
+            first_row += len(chunk)
+
+    if not parts:
+        return Timetable.from_frame(pd.DataFrame({c: pd.Series(dtype=dtype.get(c, object)) for c in columns}))
+
+    # Later chunks only append categories, so the last vocabulary covers all
+    for part in parts[:-1]:
+        for col in dtype:
+            part[col] = part[col].cat.set_categories(vocab.categories(col))
+    return Timetable(pd.concat(parts, ignore_index=True))
@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+DEFAULT_KEEP_FINISHED = 100
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """State of one background pipeline run, safe to read from any thread."""
+
+    def __init__(self, key, stages=()):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"
+        self.stages = list(stages)
+        self.stage_times = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # Guards every field the worker updates, so polls see a whole state
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def progress(self, stage):
+        with self._lock:
+            self.stage_times[stage] = time.time()
+            if stage not in self.stages:
+                self.stages.append(stage)
+
+    def update(self, **fields):
+        """Set several fields at once (e.g. status and result) under the job's lock."""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def to_dict(self):
+        with self._lock:
+            status, stages, stage_times = self.status, list(self.stages), dict(self.stage_times)
+            started, finished, result, error = self.started, self.finished, self.result, self.error
+        done = len(stage_times) - (1 if status == "running" and stage_times else 0)
+        current = max(stage_times, key=stage_times.get) if stage_times else None
+        return {
+            "id": self.id,
+            "status": status,
+            "stage": current if status == "running" else None,
+            "stages": [
+                {"name": name, "started": stage_times.get(name)} for name in stages
+            ],
+            "progress": 1.0 if status == "done" else (done / len(stages) if stages else 0.0),
+            "created": self.created,
+            "started": started,
+            "finished": finished,
+            "result": result,
+            "error": error,
+        }
+
+
+class JobQueue:
+    """
+    Bounded worker pool for pipeline runs.
+
+    Submissions with the same key as a queued or running job return that
+    job instead of starting a new one. At most max_pending jobs may be
+    waiting or running; further submissions raise QueueFull. Finished jobs
+    are kept (oldest evicted first) so clients can still poll them.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 keep_finished=DEFAULT_KEEP_FINISHED):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self._max_pending = max_pending
+        self._keep_finished = keep_finished
+        self._jobs = OrderedDict()
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, stages=(), discard=None):
+        """
+        Run fn(job) in the pool; its return value becomes job.result. If
+        the submission joins an active job instead, discard() is called so
+        the caller can release whatever fn would have consumed.
+        """
+        with self._lock:
+            existing = self._active_by_key.get(key)
+            if existing is None:
+                if len(self._active_by_key) >= self._max_pending:
+                    raise QueueFull(f"{self._max_pending} pipeline jobs already pending")
+                job = Job(key, stages)
+                self._jobs[job.id] = job
+                self._active_by_key[key] = job
+                self._evict_finished()
+
+        if existing is not None:
+            if discard is not None:
+                discard()
+            return existing
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def depth(self):
+        with self._lock:
+            return len(self._active_by_key)
+
+    def _run(self, job, fn):
+        job.update(status="running", started=time.time())
+        try:
+            result = fn(job)
+            job.update(result=result, status="done", finished=time.time())
+        except Exception as e:
+            job.update(error=f"{type(e).__name__}: {e}", status="failed", finished=time.time())
+        finally:
+            with self._lock:
+                if self._active_by_key.get(job.key) is job:
+                    del self._active_by_key[job.key]
+                self._evict_finished()
+
+    def _evict_finished(self):
+        finished = [jid for jid, j in self._jobs.items() if not j.active]
+        for jid in finished[:max(0, len(finished) - self._keep_finished)]:
+            del self._jobs[jid]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def process_rss_bytes():
+    """Current resident set size of the whole process, or None where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class PipelineRun:
+    """
+    Per-run record of stage measurements: wall time, CPU time, input/output
+    rows, whether the stage cache served it, and CP-SAT statistics for the
+    solve stage.
+
+    Memory is the process's current RSS sampled at the stage's start and
+    end (process_rss_bytes / process_rss_delta_bytes, None off Linux). It
+    is process-wide: concurrent jobs and other threads show up in it, and
+    memory freed before the stage ends does not.
+    """
+
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.stages = []
+        self.solver_stats = []
+        self.started = time.time()
+        self.wall_seconds = None
+
+    @contextmanager
+    def stage(self, name, input_rows=None):
+        if self.progress:
+            self.progress(name)
+        record = {"stage": name, "input_rows": input_rows, "output_rows": None, "cached": False}
+        wall, cpu, rss = time.perf_counter(), time.process_time(), process_rss_bytes()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall
+            record["cpu_seconds"] = time.process_time() - cpu
+            record["process_rss_bytes"] = process_rss_bytes()
+            record["process_rss_delta_bytes"] = (
+                None if rss is None or record["process_rss_bytes"] is None else record["process_rss_bytes"] - rss
+            )
+            self.stages.append(record)
+
+    def finish(self):
+        self.wall_seconds = time.time() - self.started
+
+    def to_dict(self):
+        return {
+            "wall_seconds": self.wall_seconds,
+            "stages": self.stages,
+            "solver": self.solver_stats,
+        }
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms in Prometheus text format."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) → value
+        self._histograms = {}  # (name, labels) → [bucket counts..., sum, count]
+        self._help = {}
+
+    def inc(self, name, value=1.0, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, value, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            hist = self._histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def record_run(self, run, failed=False):
+        self.inc("timetable_pipeline_runs_total", help_text="Pipeline runs", status="failed" if failed else "ok")
+        if run.wall_seconds is not None:
+            self.observe("timetable_pipeline_seconds", run.wall_seconds, help_text="End-to-end pipeline wall time")
+        for rec in run.stages:
+            stage = rec["stage"]
+            self.observe("timetable_stage_seconds", rec["wall_seconds"], help_text="Stage wall time", stage=stage)
+            self.inc("timetable_stage_cpu_seconds_total", rec["cpu_seconds"], help_text="Stage CPU time", stage=stage)
+            if rec.get("anomalous_sections") is not None:
+                self.inc("timetable_heal_sections_total", rec["sections"], help_text="Sections scored by healing")
+                self.inc("timetable_heal_anomalous_sections_total", rec["anomalous_sections"],
+                         help_text="Sections above the anomaly threshold and rebuilt")
+            if rec.get("unassigned_rows") is not None:
+                self.inc("timetable_room_unassigned_rows_total", rec["unassigned_rows"],
+                         help_text="Sessions left without a room")
+                self.inc("timetable_room_moved_rows_total", rec.get("moved_rows", 0),
+                         help_text="Sessions moved to another slot to get a room")
+            if rec["cached"]:
+                self.inc("timetable_stage_cache_hits_total", help_text="Stages served from the stage cache", stage=stage)
+            for direction in ("input", "output"):
+                if rec[f"{direction}_rows"] is not None:
+                    self.inc("timetable_stage_rows_total", rec[f"{direction}_rows"],
+                             help_text="Rows into / out of each stage", stage=stage, direction=direction)
+        for stats in run.solver_stats:
+            self.inc("timetable_solver_components_total", help_text="CP-SAT components solved", status=stats["status"])
+            self.observe("timetable_solver_seconds", stats["wall_time"], help_text="CP-SAT wall time per component")
+            self.inc("timetable_solver_branches_total", stats["branches"], help_text="CP-SAT branches")
+            self.inc("timetable_solver_conflicts_total", stats["conflicts"], help_text="CP-SAT conflicts")
+            left = stats.get("repair", stats).get("teacher_overlaps")
+            if left is not None:
+                self.inc("timetable_solver_teacher_overlaps_total", left,
+                         help_text="Teacher double-bookings left after solving")
+
+    def render(self):
+        def fmt_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in sorted(self._help.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for (n, labels), value in sorted(self._counters.items()):
+                        if n == name:
+                            lines.append(f"{name}{fmt_labels(labels)} {value}")
+                else:
+                    for (n, labels), hist in sorted(self._histograms.items()):
+                        if n != name:
+                            continue
+                        for bound, count in zip(self.buckets, hist):
+                            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {count}")
+                        lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+                        lines.append(f"{name}_sum{fmt_labels(labels)} {hist[-2]}")
+                        lines.append(f"{name}_count{fmt_labels(labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+# 📈 Shared by every pipeline run in this process
+REGISTRY = MetricsRegistry()
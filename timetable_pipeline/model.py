@@ -1,6 +1,11 @@
+import os
+import threading
+
 import torch
 import torch.nn as nn
 
+from timetable_pipeline.timetable import SLOTS_PER_WEEK
+
 class TimetableAutoencoder(nn.Module):
     def __init__(self, input_dim, param_dim, embed_dim, hidden_dim):
         super(TimetableAutoencoder, self).__init__()
@@ -20,8 +25,85 @@ class TimetableAutoencoder(nn.Module):
         dec_out, _ = self.decoder(dec_input)
         return self.output(dec_out)
 
+# Frozen TorchScript artifacts (see export_model) are recognized by suffix
+SCRIPTED_SUFFIX = ".ts"
+
 def load_model(model_path, input_dim=3, param_dim=0, embed_dim=64, hidden_dim=128):
+    if model_path.endswith(SCRIPTED_SUFFIX):
+        return torch.jit.load(model_path, map_location=torch.device('cpu')).eval()
     model = TimetableAutoencoder(input_dim, param_dim, embed_dim, hidden_dim)
     model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
     model.eval()
     return model
+
+def export_model(model_path, out_path, quantize=False, max_len=SLOTS_PER_WEEK, **model_kwargs):
+    """
+    Freeze a state_dict checkpoint into a standalone TorchScript artifact
+    that load_model/get_model accept in place of the checkpoint (out_path
+    must end in SCRIPTED_SUFFIX). With quantize=True the LSTM and Linear
+    weights are dynamically quantized to int8 first, which shrinks the
+    file but perturbs the reconstructions. Returns the largest absolute
+    output difference from the eager model on random input.
+    """
+    if not out_path.endswith(SCRIPTED_SUFFIX):
+        raise ValueError(f"Exported model path must end in {SCRIPTED_SUFFIX}")
+    model = load_model(model_path, **model_kwargs)
+    if quantize:
+        from torch.ao.quantization import quantize_dynamic
+        frozen = torch.jit.script(quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8))
+    else:
+        frozen = torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.script(model)))
+    torch.jit.save(frozen, out_path)
+
+    input_dim = model.output.out_features
+    param_dim = model.encoder.input_size - input_dim
+    x, p = torch.rand(4, max_len, input_dim), torch.zeros(4, param_dim)
+    with torch.inference_mode():
+        return (load_model(out_path)(x, p) - model(x, p)).abs().max().item()
+
+# 🗂️ Process-wide model registry: each checkpoint is deserialized once per
+# process and reloaded only when the file on disk changes.
+_model_registry = {}
+_registry_lock = threading.Lock()
+
+def get_model(model_path, **model_kwargs):
+    path = os.path.abspath(model_path)
+    mtime = os.path.getmtime(path)
+    key = (path, tuple(sorted(model_kwargs.items())))
+
+    with _registry_lock:
+        entry = _model_registry.get(key)
+        if entry is None or entry[0] != mtime:
+            _model_registry[key] = (mtime, load_model(path, **model_kwargs))
+        return _model_registry[key][1]
+
+def warm_up(model_path, max_len=SLOTS_PER_WEEK, batch_size=1, num_threads=None, **model_kwargs):
+    """
+    Load a model into the registry and run one dummy forward pass.
+    num_threads, if given, sets torch's process-wide intra-op thread count;
+    call this once at startup rather than per request.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    model = get_model(model_path, **model_kwargs)
+    # Frozen artifacts keep no submodule attributes; use load_model's dims
+    input_dim = model_kwargs.get("input_dim", 3)
+    param_dim = model_kwargs.get("param_dim", 0)
+    with torch.inference_mode():
+        model(torch.zeros(batch_size, max_len, input_dim), torch.zeros(batch_size, param_dim))
+    return model
+
+def clear_registry():
+    with _registry_lock:
+        _model_registry.clear()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the autoencoder checkpoint as a frozen TorchScript artifact.")
+    parser.add_argument("checkpoint", help="state_dict checkpoint, e.g. data/timetable_autoencoder150.pt")
+    parser.add_argument("out", help=f"artifact path ending in {SCRIPTED_SUFFIX}")
+    parser.add_argument("--quantize", action="store_true", help="dynamically quantize LSTM/Linear weights to int8")
+    args = parser.parse_args()
+    diff = export_model(args.checkpoint, args.out, quantize=args.quantize)
+    print(f"✅ Exported {args.out} (max abs difference from eager model: {diff:.4g})")
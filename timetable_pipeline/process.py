@@ -1,82 +1,230 @@
+import cProfile
+import os
+
+import numpy as np
 import pandas as pd
 
-from timetable_pipeline.model import load_model
-from timetable_pipeline.heal import reconstruct_anomalous_sections
-from timetable_pipeline.conflict_solver import solve_teacher_conflict
-from timetable_pipeline.transit import build_transit_map, repair_transit_violations
+from timetable_pipeline.heal import DEFAULT_ANOMALY_THRESHOLD, reconstruct_anomalous_sections
+from timetable_pipeline.conflict_solver import find_changed_sections, solve_teacher_conflict
+from timetable_pipeline.metrics import REGISTRY, PipelineRun
+from timetable_pipeline.reference import (
+    ROOMS_PATH, ROOMTYPE_TO_BLOCK, TRANSIT_PATH, load_room_inventory, load_teacher_map, load_transit_matrix
+)
+from timetable_pipeline.rooms import allocate_rooms
+from timetable_pipeline.stage_cache import StageCache, file_version, frame_hash, stage_key
+from timetable_pipeline.storage import DB_PATH, TimetableDB
+from timetable_pipeline.timetable import Timetable
+from timetable_pipeline.transit import repair_transit_violations
+
+# Checkpoint or exported .ts artifact (see model.export_model)
+MODEL_PATH = os.environ.get("TIMETABLE_MODEL_PATH", "data/timetable_autoencoder150.pt")
+FINAL_CSV_PATH = "data/final_transit_fixed.csv"
+PIPELINE_STAGES = ["heal", "solve", "map_blocks", "transit", "rooms", "teacher_names"]
+
+# 🧠 Stage outputs memoized by input content + model/reference versions
+STAGE_CACHE = StageCache()
+
+def open_timetable_db(path=DB_PATH):
+    """Shared versioned timetable store, seeded from FINAL_CSV_PATH when empty."""
+    return TimetableDB(path, seed_csv=FINAL_CSV_PATH)
 
-def run_full_pipeline(input_df: pd.DataFrame) -> pd.DataFrame:
+def cached_stage(cache, key, compute, record=None):
+    if cache is None:
+        return compute()
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.put(key, result)
+    elif record is not None:
+        record["cached"] = True
+    return result
+
+def run_full_pipeline(input_df, incremental: bool = False,
+                      db: TimetableDB = None, progress=None,
+                      stage_cache: StageCache = STAGE_CACHE,
+                      return_metrics: bool = False, profile_path: str = None,
+                      anomaly_threshold: float = DEFAULT_ANOMALY_THRESHOLD):
     """
     Full Smart Timetable pipeline:
     1. Heal anomalies via autoencoder
     2. Resolve teacher conflicts (CP-SAT)
     3. Normalize and map RoomType to Block
     4. Apply transit time repair
-    5. Add TeacherName from mapping
-    6. Return cleaned timetable DataFrame
+    5. Assign rooms within each Block (if data/room_inventory.xlsx exists)
+    6. Add TeacherName from mapping
+    7. Return cleaned timetable DataFrame
+
+    input_df may be a DataFrame or a Timetable (e.g. from
+    ingest.read_timetable_csv).
+
+    Healing only rebuilds sections whose autoencoder reconstruction error
+    exceeds anomaly_threshold (None rebuilds all); each section's score is
+    returned in the AnomalyScore column.
+
+    With incremental=True the input is diffed against the current version
+    in db (default: open_timetable_db()): only edited sections are healed,
+    and only they and sections sharing their teachers are re-solved.
+
+    progress, if given, is called with each name in PIPELINE_STAGES as
+    that stage starts. Heal, solve, transit and rooms outputs are reused
+    from stage_cache when their inputs are unchanged; pass None to disable.
+
+    Every run records per-stage wall/CPU time, process RSS change, row
+    counts and CP-SAT statistics into metrics.REGISTRY. With
+    return_metrics=True the result is (final_df, metrics_dict); with
+    profile_path set, the run is profiled with cProfile and the stats
+    dumped there.
     """
+    run = PipelineRun(progress)
+    profiler = cProfile.Profile() if profile_path else None
+    failed = True
+    try:
+        if profiler:
+            profiler.enable()
+        final_df = _run_stages(
+            input_df, incremental, db, stage_cache, run, anomaly_threshold
+        ).to_frame()
+        failed = False
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        run.finish()
+        REGISTRY.record_run(run, failed=failed)
+
+    if return_metrics:
+        return final_df, run.to_dict()
+    return final_df
+
+def map_room_blocks(df):
+    """Normalize RoomType in place and derive Block from it (DataFrame or Timetable)."""
+    if isinstance(df, Timetable):
+        # One string operation per distinct room type
+        df.recode("RoomType", lambda rooms: rooms.str.strip().str.lower())
+        return df.recode("RoomType", lambda rooms: rooms.map(ROOMTYPE_TO_BLOCK).fillna("Unknown-Block"),
+                         target="Block")
+    df["RoomType"] = (
+        df["RoomType"]
+        .astype(str)
+        .str.strip()
+        .str.lower()
+    )
+    df["Block"] = df["RoomType"].map(ROOMTYPE_TO_BLOCK).fillna("Unknown-Block")
+    return df
+
+def _section_scores(timetable):
+    """SectionID → AnomalyScore of a frame carrying scores, else empty."""
+    if "AnomalyScore" not in timetable.columns:
+        return {}
+    frame = timetable.frame[["SectionID", "AnomalyScore"]].dropna()
+    return dict(zip(frame["SectionID"].astype(str), frame["AnomalyScore"]))
+
+def _run_stages(input_df, incremental, db, stage_cache, run, anomaly_threshold):
+    # Step 0: Find edited sections against the last persisted timetable
+    previous_df = None
+    if incremental:
+        previous_df = (db or open_timetable_db()).load()
+
+    # Strings are stripped and interned once; stages share the codes
+    timetable = Timetable.from_frame(input_df)
+    unchanged = None
+    heal_tt = timetable
+    if previous_df is not None:
+        changed = find_changed_sections(timetable.frame, previous_df)
+        is_changed = timetable.frame["SectionID"].isin(changed).to_numpy()
+        heal_tt = timetable.mask(is_changed)
+        unchanged = timetable.mask(~is_changed)
 
     # Step 1: Prepare valid tuples for reconstruction
     valid_tuples = list(
-        input_df[["SubjectCode", "TeacherID", "Block"]]
+        heal_tt.frame[["SubjectCode", "TeacherID", "Block"]]
         .drop_duplicates()
         .itertuples(index=False, name=None)
     )
 
     # Step 2: Heal anomalies using autoencoder
-    healed_df = reconstruct_anomalous_sections(
-        input_df,
-        model_path="data/timetable_autoencoder150.pt",
-        valid_tuples=valid_tuples,
-        valid_df=input_df
-    )
+    with run.stage("heal", len(heal_tt)) as rec:
+        input_hash = frame_hash(timetable)
+        heal_hash = input_hash if heal_tt is timetable else frame_hash(heal_tt)
+        healed = cached_stage(
+            stage_cache,
+            stage_key("heal", heal_hash, input_hash, file_version(MODEL_PATH), anomaly_threshold),
+            lambda: reconstruct_anomalous_sections(
+                heal_tt,
+                model_path=MODEL_PATH,
+                valid_tuples=valid_tuples,
+                valid_df=timetable,
+                threshold=anomaly_threshold
+            ),
+            rec,
+        )
+        rec["output_rows"] = len(healed)
+        scores = _section_scores(healed)
+        rec["sections"] = len(scores)
+        rec["anomalous_sections"] = sum(
+            1 for score in scores.values() if anomaly_threshold is None or score > anomaly_threshold
+        )
+
+    # 🩺 Sections not re-scored this run keep the score they came in with
+    scores = {**_section_scores(timetable), **scores}
 
     # Step 3: Resolve teacher conflicts
-    teacher_fixed_df = solve_teacher_conflict(healed_df)
+    if unchanged is not None:
+        healed = Timetable.from_frame(
+            pd.concat([healed.to_frame(), unchanged.to_frame()], ignore_index=True), like=timetable
+        )
+    with run.stage("solve", len(healed)) as rec:
+        teacher_fixed = cached_stage(
+            stage_cache,
+            stage_key("solve", frame_hash(healed), frame_hash(previous_df)),
+            lambda: solve_teacher_conflict(healed, previous_df=previous_df, solver_stats=run.solver_stats),
+            rec,
+        )
+        rec["output_rows"] = len(teacher_fixed)
 
     # Step 4: Normalize RoomType and map to Block
-    teacher_fixed_df["RoomType"] = (
-        teacher_fixed_df["RoomType"]
-        .astype(str)
-        .str.strip()
-        .str.lower()
-    )
-
-    roomtype_to_block = {
-        "block a-dl and b-wl": "Block-DL-WL",
-        "block c-wl": "Block-C-WL",
-        "cam-3 lab": "Block-C3-LAB",
-        "cam 3 chem lab": "Block-CAM3-CHEM",
-        "cam 3 (class)": "Block-C3",
-        "cam 8 em lab": "Block-CAM8-EM",
-        "cam 8 workshop": "Block-CAM8-WORK",
-        "cam 12 (class)": "Block-C12",
-        "cam 13 sy": "Block-C13",
-        "camp 3 block a": "Block-CAMP3-A",
-        "camp 3 block e": "Block-CAMP3-E",
-        "campus 17 (class)": "Block-C17",
-        "campus 3 (physics/ed)": "Block-C3-ED",
-        "campus 8 (class)": "Block-C8"
-    }
-
-    teacher_fixed_df["Block"] = teacher_fixed_df["RoomType"].map(roomtype_to_block).fillna("Unknown-Block")
+    with run.stage("map_blocks", len(teacher_fixed)) as rec:
+        map_room_blocks(teacher_fixed)
+        rec["output_rows"] = len(teacher_fixed)
 
     # Step 5: Fix transit rule violations
-    transit_df = pd.read_excel("data/updated_transit_time_constraints.xlsx")
-    transit_map = build_transit_map(transit_df)
-    final_df = repair_transit_violations(teacher_fixed_df, transit_map)
+    with run.stage("transit", len(teacher_fixed)) as rec:
+        final = cached_stage(
+            stage_cache,
+            stage_key("transit", frame_hash(teacher_fixed), file_version(TRANSIT_PATH)),
+            lambda: repair_transit_violations(teacher_fixed, load_transit_matrix()),
+            rec,
+        )
+        rec["output_rows"] = len(final)
 
-    # Step 6: Add TeacherName from mapping
-    try:
-        mapping_path = "data/structured_teacher_mapping.xlsx"
-        teacher_map_df = pd.read_excel(mapping_path)
-        teacher_map = dict(zip(
-            teacher_map_df["TeacherID"].astype(str).str.strip(),
-            teacher_map_df["TeacherName"]
-        ))
-        final_df["TeacherID"] = final_df["TeacherID"].astype(str).str.strip()
-        final_df["TeacherName"] = final_df["TeacherID"].map(teacher_map).fillna("Unknown Faculty")
-    except Exception as e:
-        final_df["TeacherName"] = final_df["TeacherID"]  # fallback
+    # Step 6: Assign concrete rooms within each Block
+    with run.stage("rooms", len(final)) as rec:
+        try:
+            inventory = load_room_inventory()
+        except FileNotFoundError:
+            inventory = None  # no inventory: Block stays the finest location
+        if inventory is not None:
+            repaired = final
+            final = cached_stage(
+                stage_cache,
+                stage_key("rooms", frame_hash(repaired), file_version(ROOMS_PATH), file_version(TRANSIT_PATH)),
+                lambda: allocate_rooms(repaired, inventory, load_transit_matrix(),
+                                       solver_stats=run.solver_stats, stats=rec),
+                rec,
+            )
+            rec["unassigned_rows"] = int((final.codes("RoomID") < 0).sum())
+        rec["output_rows"] = len(final)
 
-    return final_df
+    # Step 7: Add TeacherName from mapping
+    with run.stage("teacher_names", len(final)) as rec:
+        try:
+            teacher_map = load_teacher_map()
+            final.recode("TeacherID", lambda ids: ids.map(teacher_map).fillna("Unknown Faculty"),
+                         target="TeacherName")
+        except Exception as e:
+            final.frame["TeacherName"] = final.frame["TeacherID"]  # fallback
+        rec["output_rows"] = len(final)
+
+    section_scores = pd.Index(final.categories("SectionID")).map(scores).to_numpy(dtype=float)
+    final.frame["AnomalyScore"] = np.append(section_scores, np.nan)[final.codes("SectionID")]
+    return final
@@ -0,0 +1,118 @@
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+import pandas as pd
+
+from timetable_pipeline.rooms import build_room_inventory
+from timetable_pipeline.transit import build_transit_map, compile_transit_map
+
+TRANSIT_PATH = "data/updated_transit_time_constraints.xlsx"
+TEACHER_MAPPING_PATH = "data/structured_teacher_mapping.xlsx"
+ROOMS_PATH = "data/room_inventory.xlsx"
+CACHE_DIR = "data/.cache"
+
+# Normalized (stripped, lower-cased) RoomType → Block
+ROOMTYPE_TO_BLOCK = {
+    "block a-dl and b-wl": "Block-DL-WL",
+    "block c-wl": "Block-C-WL",
+    "cam-3 lab": "Block-C3-LAB",
+    "cam 3 chem lab": "Block-CAM3-CHEM",
+    "cam 3 (class)": "Block-C3",
+    "cam 8 em lab": "Block-CAM8-EM",
+    "cam 8 workshop": "Block-CAM8-WORK",
+    "cam 12 (class)": "Block-C12",
+    "cam 13 sy": "Block-C13",
+    "camp 3 block a": "Block-CAMP3-A",
+    "camp 3 block e": "Block-CAMP3-E",
+    "campus 17 (class)": "Block-C17",
+    "campus 3 (physics/ed)": "Block-C3-ED",
+    "campus 8 (class)": "Block-C8"
+}
+
+# 🗂️ Compiled reference data, keyed by (abspath, kind).
+# Each entry is (mtime, size, content_hash, value).
+_reference_cache = {}
+_cache_lock = threading.Lock()
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _compiled_path(path, kind, content_hash, cache_dir):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}.{kind}.{content_hash[:16]}.pkl")
+
+def _write_atomic(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def load_compiled(path, kind, build, cache_dir=CACHE_DIR):
+    """
+    Return build(pd.read_excel(path)), parsing the workbook at most once per
+    content version. Results are kept in memory and pickled under cache_dir;
+    an unchanged mtime/size skips even the hash, and a changed hash
+    invalidates both.
+    """
+    abspath = os.path.abspath(path)
+    stat = os.stat(abspath)
+    key = (abspath, kind)
+
+    with _cache_lock:
+        entry = _reference_cache.get(key)
+        if entry and entry[:2] == (stat.st_mtime, stat.st_size):
+            return entry[3]
+
+        content_hash = file_hash(abspath)
+        if entry and entry[2] == content_hash:
+            value = entry[3]
+        else:
+            compiled = _compiled_path(abspath, kind, content_hash, cache_dir)
+            try:
+                with open(compiled, "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = build(pd.read_excel(abspath))
+                try:
+                    _write_atomic(compiled, value)
+                    # 🧹 Drop compiled files of older workbook versions
+                    for stale in glob.glob(_compiled_path(abspath, kind, "*", cache_dir)):
+                        if stale != compiled:
+                            os.remove(stale)
+                except OSError:
+                    pass  # read-only checkout: memory cache still applies
+
+        _reference_cache[key] = (stat.st_mtime, stat.st_size, content_hash, value)
+        return value
+
+def clear_cache():
+    with _cache_lock:
+        _reference_cache.clear()
+
+# 🚏 Transit constraints → dense gap matrix
+def load_transit_matrix(path=TRANSIT_PATH):
+    return load_compiled(path, "transit", lambda df: compile_transit_map(build_transit_map(df)))
+
+# 👨‍🏫 TeacherID → TeacherName
+def _build_teacher_map(df):
+    return dict(zip(df["TeacherID"].astype(str).str.strip(), df["TeacherName"]))
+
+def load_teacher_map(path=TEACHER_MAPPING_PATH):
+    return load_compiled(path, "teachers", _build_teacher_map)
+
+# 🚪 RoomID / Block inventory → rooms grouped by block
+def load_room_inventory(path=ROOMS_PATH):
+    return load_compiled(path, "rooms", build_room_inventory)
@@ -0,0 +1,300 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from timetable_pipeline.timetable import Timetable
+from timetable_pipeline.transit import TransitMatrix, compile_transit_map, normalize_block
+
+DEFAULT_NUM_WORKERS = 8
+DEFAULT_TIME_LIMIT = 10.0
+MAX_CANDIDATE_SLOTS = 8
+STRATEGIES = ("best_fit", "first_fit")
+
+# Rooms sorted by block: block b owns room indexes starts[b]:starts[b + 1]
+RoomInventory = namedtuple("RoomInventory", ["room_ids", "block_index", "starts"])
+
+
+def build_room_inventory(rooms_df):
+    """Compile a RoomID / Block table into a RoomInventory."""
+    missing = [c for c in ("RoomID", "Block") if c not in rooms_df.columns]
+    if missing:
+        raise ValueError(f"Room inventory is missing columns: {', '.join(missing)}")
+    rooms = rooms_df[["RoomID", "Block"]].dropna()
+    room_ids = rooms["RoomID"].astype(str).str.strip()
+    duplicated = room_ids[room_ids.duplicated()].unique()
+    if len(duplicated):
+        raise ValueError(f"Room inventory repeats RoomID: {', '.join(duplicated[:10])}")
+
+    blocks = normalize_block(rooms["Block"].values)
+    names = sorted(blocks.unique())
+    block_index = {name: i for i, name in enumerate(names)}
+    block_ids = blocks.map(block_index).to_numpy(dtype=np.int64)
+    order = np.argsort(block_ids, kind="stable")
+    starts = np.searchsorted(block_ids[order], np.arange(len(names) + 1))
+    return RoomInventory(room_ids.to_numpy(dtype=object)[order], block_index, starts)
+
+
+def _pick_rooms(free, booked, count, strategy):
+    """
+    Indexes (into free) of up to count free rooms. first_fit takes the
+    lowest-numbered ones; best_fit the ones already booked in the most
+    slots, packing sessions into few rooms and leaving whole rooms free.
+    """
+    candidates = np.flatnonzero(free)
+    if strategy == "best_fit" and len(candidates) > count:
+        candidates = candidates[np.argsort(-booked[candidates], kind="stable")]
+    return candidates[:count]
+
+
+def _fill_cells(rows, block_ids, slots, lessons, starts, occupied, booked, room, strategy):
+    """
+    Greedy pass over (slot, block) cells in slot order. A lesson keeps the
+    room it got in its first session when that room is free; other
+    sessions get rooms by strategy. Returns the rows that did not fit.
+    """
+    if len(rows) == 0:
+        return np.zeros(0, dtype=np.int64)  # no row's Block has rooms in the inventory
+    home = np.full(lessons.max() + 1 if len(lessons) else 0, -1, dtype=np.int64)
+    order = rows[np.lexsort((lessons[rows], block_ids[rows], slots[rows]))]
+    cell_change = np.r_[True, (slots[order][1:] != slots[order][:-1])
+                        | (block_ids[order][1:] != block_ids[order][:-1])]
+    overflow = []
+    for cell in np.split(order, np.flatnonzero(cell_change)[1:]):
+        slot, block = slots[cell[0]], block_ids[cell[0]]
+        lo, hi = starts[block], starts[block + 1]
+        free = ~occupied[lo:hi, slot]
+
+        # 🏠 Same room as the lesson's earlier sessions, first come first served
+        preferred = home[lessons[cell]] - lo
+        usable = (preferred >= 0) & (preferred < hi - lo)
+        usable[usable] = free[preferred[usable]]
+        _, first = np.unique(preferred[usable], return_index=True)
+        keep = np.flatnonzero(usable)[first]
+        room[cell[keep]] = lo + preferred[keep]
+        free[preferred[keep]] = False
+
+        rest = np.setdiff1d(np.arange(len(cell)), keep, assume_unique=True)
+        picked = _pick_rooms(free, booked[lo:hi], len(rest), strategy)
+        room[cell[rest[:len(picked)]]] = lo + picked
+        overflow.append(cell[rest[len(picked):]])
+
+        placed = cell[room[cell] >= 0]
+        occupied[room[placed], slot] = True
+        booked[room[placed]] += 1
+        new_home = lessons[placed][home[lessons[placed]] < 0]
+        home[new_home] = room[placed][home[lessons[placed]] < 0]
+    return np.concatenate(overflow) if overflow else np.zeros(0, dtype=np.int64)
+
+
+def _transit_ok(slot, block, other_slots, other_blocks, gaps):
+    """Whether a session at slot in block keeps the transit gap to a teacher's other sessions."""
+    if gaps is None or len(other_slots) == 0:
+        return True
+    distance = np.abs(other_slots - slot)
+    return bool(np.all((distance == 0) | (distance >= gaps[block, other_blocks])))
+
+
+def _place_overflow(overflow, ctx, slots, num_search_workers, max_time_in_seconds):
+    """
+    CP-SAT fallback for sessions that found no free room in their cell.
+
+    x[row, slot] is 1 when the session moves to slot. Each session moves
+    at most once, to one of its MAX_CANDIDATE_SLOTS nearest slots where its
+    section and teacher are free, its block has a free room and the
+    teacher's transit gaps to fixed sessions hold. Moved sessions share
+    free rooms, sections and teachers, and keep transit gaps among
+    themselves. The objective places as many sessions as possible, then
+    minimizes how far they move.
+
+    Returns ({row: new slot}, stats).
+    """
+    section_codes, teacher_codes, block_ids = ctx["section"], ctx["teacher"], ctx["block"]
+    section_busy, teacher_busy, free_rooms = ctx["section_busy"], ctx["teacher_busy"], ctx["free_rooms"]
+    transit_ids, gaps, by_teacher = ctx["transit_ids"], ctx["gaps"], ctx["by_teacher"]
+    stats = {"stage": "rooms", "rows": len(overflow)}
+
+    candidates = {}
+    for row in overflow:
+        slot, block, teacher = ctx["slots"][row], block_ids[row], teacher_codes[row]
+        others = by_teacher(teacher) if teacher >= 0 else np.zeros(0, dtype=np.int64)
+        others = others[others != row]
+        options = [
+            s for s in sorted(slots, key=lambda s: (abs(s - slot), s))
+            if s != slot
+            and free_rooms[block, s] > 0
+            and not section_busy[section_codes[row], s]
+            and (teacher < 0 or not teacher_busy[teacher, s])
+            and _transit_ok(s, transit_ids[row], ctx["slots"][others], transit_ids[others], gaps)
+        ]
+        if options:
+            candidates[row] = options[:MAX_CANDIDATE_SLOTS]
+    if not candidates:
+        stats.update(status="INFEASIBLE", wall_time=0.0, branches=0, conflicts=0, moved=0)
+        return {}, stats
+
+    from ortools.sat.python import cp_model  # heavy; loaded only when a slot is contested
+
+    model = cp_model.CpModel()
+    x = {}
+    by_cell, by_section_slot, by_teacher_slot = {}, {}, {}
+    for row, options in candidates.items():
+        row_vars = []
+        for s in options:
+            var = model.NewBoolVar(f"x_{row}_{s}")
+            x[row, s] = var
+            row_vars.append(var)
+            by_cell.setdefault((block_ids[row], s), []).append(var)
+            by_section_slot.setdefault((section_codes[row], s), []).append(var)
+            if teacher_codes[row] >= 0:
+                by_teacher_slot.setdefault((teacher_codes[row], s), []).append(var)
+        model.AddAtMostOne(row_vars)
+
+    for (block, s), vars_ in by_cell.items():
+        if len(vars_) > free_rooms[block, s]:
+            model.Add(sum(vars_) <= int(free_rooms[block, s]))
+    for group in (by_section_slot, by_teacher_slot):
+        for vars_ in group.values():
+            if len(vars_) > 1:
+                model.AddAtMostOne(vars_)
+
+    # 🚏 Two moved sessions of one teacher still need their transit gap
+    if gaps is not None:
+        moving_by_teacher = {}
+        for row in sorted(candidates):
+            if teacher_codes[row] >= 0:
+                moving_by_teacher.setdefault(teacher_codes[row], []).append(row)
+        pairs = ((r1, r2) for rows in moving_by_teacher.values()
+                 for i, r1 in enumerate(rows) for r2 in rows[i + 1:])
+        for r1, r2 in pairs:
+            gap = gaps[transit_ids[r1], transit_ids[r2]]
+            for s1 in candidates[r1]:
+                for s2 in candidates[r2]:
+                    if 0 < abs(s1 - s2) < gap:
+                        model.AddBoolOr([x[r1, s1].Not(), x[r2, s2].Not()])
+
+    # 🎯 Place as many as possible, then keep them close to their slot
+    weight = len(slots) + 1
+    model.Maximize(sum((weight - abs(s - int(ctx["slots"][row]))) * var for (row, s), var in x.items()))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = num_search_workers
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    status = solver.Solve(model)
+
+    moves = {}
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        moves = {row: s for (row, s), var in x.items() if solver.BooleanValue(var)}
+    stats.update(
+        status=solver.StatusName(status),
+        wall_time=solver.WallTime(),
+        branches=solver.NumBranches(),
+        conflicts=solver.NumConflicts(),
+        moved=len(moves),
+    )
+    return moves, stats
+
+
+def allocate_rooms(df, inventory, transit_map=None, strategy="best_fit",
+                   num_search_workers=DEFAULT_NUM_WORKERS, max_time_in_seconds=DEFAULT_TIME_LIMIT,
+                   solver_stats=None, stats=None):
+    """
+    Assign every session a concrete room of its Block in a RoomID column.
+
+    Occupancy is a room x slot boolean matrix over the inventory, with
+    rooms of a block stored contiguously, so each (slot, block) cell is
+    filled with one slice and no scan over other blocks. A greedy pass
+    fills cells in slot order (see _fill_cells / _pick_rooms). Sessions
+    in contested cells, where the block has fewer rooms than sessions,
+    are handed to a CP-SAT model that moves them to nearby slots with a
+    free room (see _place_overflow). Sessions that still do not fit, or
+    whose Block has no rooms in the inventory, keep their slot with no
+    RoomID.
+
+    transit_map (TransitMatrix or nested dict) keeps moved sessions
+    within the teacher's transit gaps; without it gaps are not checked.
+    Solver statistics are appended to solver_stats; counts of assigned,
+    moved and unassigned rows are written into stats if given.
+
+    Accepts a DataFrame or a Timetable and returns the same kind.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy must be one of: {', '.join(STRATEGIES)}")
+    timetable = df if isinstance(df, Timetable) else Timetable.from_frame(df)
+    tt = timetable.copy()
+    frame = tt.frame
+    n = len(tt)
+    slots = frame["SlotIndex"].to_numpy(dtype=np.int64).copy()
+    n_rooms = len(inventory.room_ids)
+
+    # 🧭 Block of every row as an inventory block id (-1: no rooms known)
+    block_of_cat = normalize_block(tt.categories("Block")).map(inventory.block_index).fillna(-1)
+    block_ids = np.append(block_of_cat.to_numpy(dtype=np.int64), -1)[tt.codes("Block")]
+    roomable = np.flatnonzero((block_ids >= 0) & (slots >= 0))
+
+    section_codes, teacher_codes = tt.codes("SectionID"), tt.codes("TeacherID")
+    n_subjects = len(tt.categories("SubjectCode")) + 1
+    lessons, _ = pd.factorize(section_codes.astype(np.int64) * n_subjects + tt.codes("SubjectCode"))
+
+    n_slots = int(slots.max()) + 1 if n else 0
+    occupied = np.zeros((n_rooms, n_slots), dtype=bool)
+    booked = np.zeros(n_rooms, dtype=np.int64)
+    room = np.full(n, -1, dtype=np.int64)
+    overflow = _fill_cells(roomable, block_ids, slots, lessons, inventory.starts,
+                           occupied, booked, room, strategy)
+
+    moves = {}
+    if len(overflow):
+        # 🔁 Free rooms per (block, slot) from the occupancy index, by block slice sums
+        used = np.add.reduceat(occupied, inventory.starts[:-1], axis=0, dtype=np.int64)
+        free_rooms = np.diff(inventory.starts)[:, None] - used
+        section_busy = np.zeros((len(tt.categories("SectionID")) + 1, n_slots), dtype=bool)
+        teacher_busy = np.zeros((len(tt.categories("TeacherID")) + 1, n_slots), dtype=bool)
+        valid = slots >= 0
+        section_busy[section_codes[valid], slots[valid]] = True
+        teacher_busy[teacher_codes[valid], slots[valid]] = True
+
+        transit_ids, gaps = np.zeros(n, dtype=np.int64), None
+        if transit_map is not None:
+            if not isinstance(transit_map, TransitMatrix):
+                transit_map = compile_transit_map(transit_map)
+            unknown = len(transit_map.gaps)
+            transit_of_cat = normalize_block(tt.categories("Block")).map(transit_map.block_index).fillna(unknown)
+            transit_ids = np.append(transit_of_cat.to_numpy(dtype=np.int64), unknown)[tt.codes("Block")]
+            gaps = np.pad(transit_map.gaps, ((0, 1), (0, 1)))
+
+        teacher_order = np.argsort(teacher_codes, kind="stable")
+        teacher_starts = np.searchsorted(teacher_codes[teacher_order], np.arange(teacher_codes.max() + 2))
+
+        ctx = {
+            "slots": slots, "section": section_codes, "teacher": teacher_codes, "block": block_ids,
+            "section_busy": section_busy, "teacher_busy": teacher_busy, "free_rooms": free_rooms,
+            "transit_ids": transit_ids, "gaps": gaps,
+            "by_teacher": lambda t: teacher_order[teacher_starts[t]:teacher_starts[t + 1]],
+        }
+        candidate_slots = np.unique(slots[valid]).tolist()
+        moves, solve_stats = _place_overflow(overflow, ctx, candidate_slots,
+                                             num_search_workers, max_time_in_seconds)
+        if solver_stats is not None:
+            solver_stats.append(solve_stats)
+
+        for row, new_slot in sorted(moves.items()):
+            lo, hi = inventory.starts[block_ids[row]], inventory.starts[block_ids[row] + 1]
+            picked = _pick_rooms(~occupied[lo:hi, new_slot], booked[lo:hi], 1, strategy)
+            room[row] = lo + picked[0]
+            occupied[room[row], new_slot] = True
+            booked[room[row]] += 1
+            slots[row] = new_slot
+
+    frame["SlotIndex"] = slots
+    frame["RoomID"] = pd.Categorical.from_codes(room, categories=pd.Index(inventory.room_ids, dtype=object))
+    if stats is not None:
+        stats.update(
+            rooms=n_rooms,
+            assigned_rows=int((room >= 0).sum()),
+            unmapped_rows=int(n - len(roomable)),
+            contested_rows=int(len(overflow)),
+            moved_rows=len(moves),
+            unassigned_rows=int((room < 0).sum()),
+        )
+    return tt if isinstance(df, Timetable) else tt.to_frame()
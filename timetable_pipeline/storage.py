@@ -0,0 +1,359 @@
+import base64
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+DB_PATH = "data/timetables.sqlite"
+DEFAULT_NAME = "final"
+DEFAULT_KEEP_VERSIONS = 20
+INDEXED_COLUMNS = ["SectionID", "TeacherID"]
+CHUNK_ROWS = 5000  # rows per query when streaming a version
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    rows INTEGER NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS current (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL REFERENCES versions(version)
+);
+"""
+
+
+_PANDAS_TYPES = {"INTEGER": "int64", "REAL": "float64", "TEXT": "str"}
+
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def encode_cursor(version, after):
+    """Opaque page token: the version being read and the last rowid already returned."""
+    return base64.urlsafe_b64encode(f"{int(version)}:{int(after)}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """(version, after) of a cursor from encode_cursor(); ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        version, after = (int(part) for part in raw.split(":"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+    if version < 1 or after < 0:
+        raise ValueError(f"Invalid cursor: {token!r}")
+    return version, after
+
+
+def _sql_values(series):
+    """Column values as Python scalars SQLite accepts, with NaN → NULL."""
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(series).to_numpy()
+    if missing.any():
+        values[missing] = None
+    if pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return [None if v is None else int(v) for v in values]
+    if pd.api.types.is_float_dtype(series.dtype):
+        return [None if v is None else float(v) for v in values]
+    return [None if v is None else str(v) for v in values]
+
+
+class TimetableDB:
+    """
+    Versioned timetable storage in one SQLite file.
+
+    Every save() writes the frame into its own typed, indexed
+    snapshot_<version> table that is never modified afterwards, and moves
+    the named "current" pointer to it in the same transaction, so readers
+    see either the old or the new version, never a partial one. Loads can
+    project columns and filter by section/teacher through the indexes;
+    CSV is only produced on demand by export_csv(). The oldest versions
+    beyond keep_versions per name are dropped (the current one never is).
+
+    With seed_csv, an empty store imports that CSV as its first version.
+    """
+
+    def __init__(self, path=DB_PATH, seed_csv=None, keep_versions=DEFAULT_KEEP_VERSIONS):
+        self.path = path
+        self.keep_versions = keep_versions
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")  # readers never block the writer
+        conn.executescript(_SCHEMA)
+        if seed_csv and os.path.exists(seed_csv) and self.current_version() is None:
+            self.save(pd.read_csv(seed_csv), source=seed_csv, only_if_empty=True)
+
+    def _conn(self):
+        # One connection per thread; autocommit, transactions are explicit
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            self._local.conn = conn
+        return conn
+
+    # ✍️ Writes
+    def save(self, df, name=DEFAULT_NAME, source=None, only_if_empty=False):
+        """Store df as a new immutable version and make it current. Returns the version."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if only_if_empty and self.current_version(name) is not None:
+                conn.execute("ROLLBACK")
+                return self.current_version(name)
+
+            cur = conn.execute(
+                "INSERT INTO versions (name, created, rows, source) VALUES (?, ?, ?, ?)",
+                (name, time.time(), len(df), source),
+            )
+            version = cur.lastrowid
+            table = _quote(f"snapshot_{version}")
+            columns = [str(c) for c in df.columns]
+            conn.execute(f"CREATE TABLE {table} ("
+                         + ", ".join(f"{_quote(c)} {_sql_type(df[c].dtype)}" for c in columns) + ")")
+            if len(df):
+                placeholders = ", ".join("?" * len(columns))
+                conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})",
+                                 zip(*(_sql_values(df[c]) for c in df.columns)))
+            for col in INDEXED_COLUMNS:
+                if col in columns:
+                    conn.execute(f"CREATE INDEX {_quote(f'snapshot_{version}_{col}')} ON {table} ({_quote(col)})")
+            conn.execute("INSERT OR REPLACE INTO current (name, version) VALUES (?, ?)", (name, version))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.prune(name)
+        return version
+
+    def set_current(self, version, name=DEFAULT_NAME):
+        """Point name at an existing version (e.g. to roll back)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._version_row(version)
+            if row is None or row[1] != name:
+                raise KeyError(f"Unknown {name} timetable version {version}")
+            conn.execute("INSERT OR REPLACE INTO current (name, version) VALUES (?, ?)", (name, int(version)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def prune(self, name=DEFAULT_NAME, keep=None):
+        """Drop snapshots of name beyond the newest keep versions, never the current one."""
+        keep = self.keep_versions if keep is None else keep
+        conn = self._conn()
+        current = self.current_version(name)
+        stale = [
+            v for (v,) in conn.execute(
+                "SELECT version FROM versions WHERE name = ? ORDER BY version DESC LIMIT -1 OFFSET ?",
+                (name, keep),
+            )
+            if v != current
+        ]
+        if not stale:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for version in stale:
+                conn.execute(f"DROP TABLE IF EXISTS {_quote(f'snapshot_{version}')}")
+                conn.execute("DELETE FROM versions WHERE version = ?", (version,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # 📖 Reads
+    def current_version(self, name=DEFAULT_NAME):
+        row = self._conn().execute("SELECT version FROM current WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _version_row(self, version):
+        return self._conn().execute(
+            "SELECT version, name, created, rows, source FROM versions WHERE version = ?", (int(version),)
+        ).fetchone()
+
+    def version_info(self, version=None, name=DEFAULT_NAME):
+        version = self.current_version(name) if version is None else version
+        row = self._version_row(version) if version is not None else None
+        if row is None:
+            return None
+        return dict(zip(["version", "name", "created", "rows", "source"], row))
+
+    def versions(self, name=None):
+        query = "SELECT version, name, created, rows, source FROM versions"
+        params = ()
+        if name is not None:
+            query, params = query + " WHERE name = ?", (name,)
+        return pd.read_sql_query(query + " ORDER BY version", self._conn(), params=params)
+
+    def column_types(self, version):
+        """Column name → SQLite type of a stored version, in column order."""
+        table_info = self._conn().execute(f"PRAGMA table_info({_quote(f'snapshot_{int(version)}')})")
+        return {row[1]: row[2] for row in table_info}
+
+    def _select(self, name, version, columns, sections, teachers):
+        """Resolve version; returns it with the projected column list, table and WHERE terms."""
+        version = self.current_version(name) if version is None else version
+        if version is None:
+            return None, None
+        available = list(self.column_types(version))
+        if not available:
+            raise KeyError(f"Unknown timetable version {version}")
+        if columns is not None:
+            unknown = [c for c in columns if c not in available]
+            if unknown:
+                raise KeyError(f"Unknown columns: {', '.join(map(str, unknown))}")
+        selected = available if columns is None else list(columns)
+
+        where, params = [], []
+        for col, values in (("SectionID", sections), ("TeacherID", teachers)):
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            values = [str(v).strip() for v in values]
+            where.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})" if values else "0")
+            params.extend(values)
+
+        query = {
+            "columns": ", ".join(map(_quote, selected)),
+            "table": _quote(f"snapshot_{int(version)}"),
+            "where": where,
+            "params": params,
+        }
+        return int(version), query
+
+    def _typed(self, df, version):
+        if df.empty:
+            # Empty results come back untyped; use the stored column types
+            types = self.column_types(version)
+            df = df.astype({c: _PANDAS_TYPES[types[c]] for c in df.columns})
+        return df
+
+    def load(self, name=DEFAULT_NAME, version=None, columns=None, sections=None, teachers=None):
+        """
+        Read a version (default: the current one of name) as a DataFrame.
+        columns projects; sections / teachers filter on the indexed
+        SectionID / TeacherID columns. Returns None if nothing is stored.
+        """
+        version, query = self._select(name, version, columns, sections, teachers)
+        if version is None:
+            return None
+        sql = f"SELECT {query['columns']} FROM {query['table']}"
+        if query["where"]:
+            sql += " WHERE " + " AND ".join(query["where"])
+        df = pd.read_sql_query(sql + " ORDER BY rowid", self._conn(), params=query["params"])
+        return self._typed(df, version)
+
+    def _rows_after(self, version, query, after, limit):
+        # Keyset pagination: rowid is the table's primary key, so each page
+        # is a range seek no matter how deep into the version it starts
+        where = " AND ".join(query["where"] + ["rowid > ?"])
+        sql = (f"SELECT rowid AS _rowid, {query['columns']} FROM {query['table']} "
+               f"WHERE {where} ORDER BY rowid LIMIT ?")
+        df = pd.read_sql_query(sql, self._conn(), params=[*query["params"], int(after), int(limit)])
+        df.index = pd.Index(df.pop("_rowid").to_numpy(dtype="int64") - 1)
+        return self._typed(df, version)
+
+    def load_page(self, limit, after=0, name=DEFAULT_NAME, version=None,
+                  columns=None, sections=None, teachers=None):
+        """
+        Up to limit rows of a version after rowid after, for cursor-based
+        pagination. Returns (version, df, next_after): df is indexed by
+        0-based row position in the version and next_after is None on the
+        last page. Returns (None, None, None) if nothing is stored.
+        """
+        version, query = self._select(name, version, columns, sections, teachers)
+        if version is None:
+            return None, None, None
+        df = self._rows_after(version, query, after, limit + 1)
+        if len(df) <= limit:
+            return version, df, None
+        df = df.iloc[:limit]
+        return version, df, int(df.index[-1]) + 1
+
+    def iter_chunks(self, name=DEFAULT_NAME, version=None, columns=None, sections=None,
+                    teachers=None, after=0, limit=None, chunk_rows=CHUNK_ROWS):
+        """
+        Stream a version as DataFrames of at most chunk_rows rows (indexed
+        like load_page), starting after rowid after and stopping after limit
+        rows. The first chunk is always yielded, empty if no rows match, so
+        consumers can emit headers. Returns (version, iterator), or
+        (None, None) if nothing is stored; unknown versions/columns raise
+        KeyError before iterating.
+        Snapshot tables are immutable, so a stream is consistent even if
+        the current version moves meanwhile.
+        """
+        version, query = self._select(name, version, columns, sections, teachers)
+        if version is None:
+            return None, None
+
+        def chunks(after=after, remaining=limit):
+            first = True
+            while first or remaining is None or remaining > 0:
+                size = chunk_rows if remaining is None else min(chunk_rows, remaining)
+                df = self._rows_after(version, query, after, size)
+                if df.empty and not first:
+                    return
+                first = False
+                yield df
+                if df.empty or len(df) < size:
+                    return
+                after = int(df.index[-1]) + 1
+                if remaining is not None:
+                    remaining -= len(df)
+
+        return version, chunks()
+
+    def export_csv(self, path=None, **load_kwargs):
+        """
+        CSV view of a version; written atomically to path, or returned as
+        text. Rows are read and written in chunks (see iter_chunks).
+        """
+        version, chunks = self.iter_chunks(**load_kwargs)
+        if version is None:
+            return None
+        if path is None:
+            return "".join(iter_csv(chunks))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".csv.tmp")
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                f.writelines(iter_csv(chunks))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return path
+
+
+def iter_csv(chunks):
+    """CSV text per DataFrame chunk, the header only with the first."""
+    for i, df in enumerate(chunks):
+        yield df.to_csv(index=False, header=i == 0)
+
+
+def iter_ndjson(chunks):
+    """Newline-delimited JSON records per DataFrame chunk."""
+    for df in chunks:
+        if len(df):
+            yield df.to_json(orient="records", lines=True)
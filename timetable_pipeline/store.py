@@ -0,0 +1,86 @@
+import threading
+
+import pandas as pd
+
+from timetable_pipeline.formatter import build_entity_index, format_admin_view, lookup_entity
+from timetable_pipeline.storage import DEFAULT_NAME
+
+EMPTY_JSON = "[]"  # body of a section/teacher with no rows
+
+
+class TimetableSnapshot:
+    """
+    One immutable version of the processed timetable with prebuilt
+    per-section/per-teacher indexes and memoized JSON bodies.
+    """
+
+    def __init__(self, df, etag, last_modified):
+        self.df = df
+        self.etag = etag
+        self.last_modified = last_modified
+        self.indexes = {
+            "section": build_entity_index(df, "SectionID") if "SectionID" in df.columns else None,
+            "teacher": build_entity_index(df, "TeacherID") if "TeacherID" in df.columns else None,
+        }
+        self._json = {}
+
+    def admin_json(self):
+        return self._memo(("admin", None), lambda: format_admin_view(self.df))
+
+    def entity_json(self, kind, key):
+        index = self.indexes[kind]
+        key = str(key).strip()
+        # Unknown IDs share one body, so arbitrary lookups can't grow the memo
+        if index is None or key not in index.bounds:
+            return EMPTY_JSON
+        return self._memo((kind, key), lambda: lookup_entity(index, key))
+
+    def _memo(self, key, build):
+        body = self._json.get(key)
+        if body is None:
+            body = build().to_json(orient="records")
+            self._json[key] = body
+        return body
+
+
+class TimetableStore:
+    """
+    Process-level holder of the current timetable in a TimetableDB. A
+    version is loaded once and reloaded only when the store's current
+    pointer moves; replace() saves a new version and swaps the snapshot
+    in one step.
+    """
+
+    def __init__(self, db, name=DEFAULT_NAME):
+        self.db = db
+        self.name = name
+        self._lock = threading.Lock()
+        self._current = (None, None)  # (version, snapshot), swapped as one
+
+    def _build(self, version):
+        if version is None:
+            return TimetableSnapshot(pd.DataFrame([]), "empty", None)
+        info = self.db.version_info(version)
+        return TimetableSnapshot(self.db.load(version=version), f"v{version}", info["created"])
+
+    def snapshot(self):
+        loaded_version, snap = self._current
+        if snap is not None and self.db.current_version(self.name) == loaded_version:
+            return snap
+
+        with self._lock:
+            version = self.db.current_version(self.name)
+            loaded_version, snap = self._current
+            if snap is None or version != loaded_version:
+                snap = self._build(version)
+                self._current = (version, snap)
+            return snap
+
+    def replace(self, df, source=None):
+        """Persist df as the new current timetable and publish it."""
+        with self._lock:
+            version = self.db.save(df, self.name, source=source)
+            # Reload so readers see exactly what a fresh load would
+            snap = self._build(version)
+            self._current = (version, snap)
+        return snap
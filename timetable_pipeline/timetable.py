@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+CSV_COLUMNS = ["SectionID", "SlotIndex", "SubjectCode", "TeacherID", "Scheme", "Subject", "RoomType", "Block"]
+# Slots per week as the data and the autoencoder's sequences lay them out:
+# 6 days x 8 hourly slots, plus slots 48-49
+SLOTS_PER_WEEK = 50
+SLOTS_PER_DAY = 8
+STRING_COLUMNS = ["SectionID", "SubjectCode", "TeacherID", "Scheme", "Subject", "RoomType", "Block", "TeacherName", "RoomID"]
+
+
+def intern(values, categories=None):
+    """
+    Strip and intern values into a Categorical whose categories keep first
+    appearance order, appended after any existing categories so codes stay
+    comparable across frames sharing a vocabulary. Missing values stay missing.
+    """
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        raw_codes, raw_uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        raw_codes, raw_uniques = pd.factorize(np.asarray(values, dtype=object))
+
+    # String work happens once per distinct value, not once per row
+    stripped = pd.Index(raw_uniques, dtype=object).astype(str).str.strip()
+    base = pd.Index([] if categories is None else categories, dtype=object)
+    merged = base.append(stripped.difference(base, sort=False)) if len(stripped) else base
+    merged = merged.unique()
+
+    lookup = merged.get_indexer(stripped)
+    codes = np.where(raw_codes >= 0, lookup[raw_codes] if len(lookup) else -1, -1)
+    return pd.Categorical.from_codes(codes, categories=merged)
+
+
+def integer_slots(values, first_row=0, error=ValueError):
+    """
+    SlotIndex values as int64; raise error naming the first row (counted
+    from first_row) that is missing, non-numeric or fractional.
+    """
+    values = pd.Series(values)
+    slots = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+    bad = np.flatnonzero(~np.isfinite(slots) | (slots != np.floor(slots)))
+    if len(bad):
+        raise error(
+            f"SlotIndex must be an integer; got '{values.iloc[bad[0]]}' in data row {first_row + bad[0] + 1}"
+            + (f" and {len(bad) - 1} more rows" if len(bad) > 1 else "")
+        )
+    return slots.astype(np.int64)
+
+
+class Timetable:
+    """
+    Compact timetable shared across pipeline stages.
+
+    String columns are normalized (stripped) once and stored as
+    categoricals with integer codes; SlotIndex is int64. Stages read codes
+    and vocabularies instead of re-normalizing strings, and only the
+    pipeline edges convert back to the plain CSV schema with to_frame().
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    @classmethod
+    def from_frame(cls, df, like=None):
+        """Normalize df once; reuse like's vocabularies so codes line up."""
+        if isinstance(df, Timetable):
+            return df
+        columns = {}
+        for col in df.columns:
+            if col in STRING_COLUMNS:
+                shared = like.categories(col) if like is not None and col in like.frame.columns else None
+                columns[col] = intern(df[col], shared)
+            elif col == "SlotIndex":
+                columns[col] = integer_slots(df[col])
+            else:
+                columns[col] = df[col].to_numpy()
+        return cls(pd.DataFrame(columns))
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def codes(self, col):
+        return self.frame[col].cat.codes.to_numpy()
+
+    def categories(self, col):
+        return self.frame[col].cat.categories
+
+    def recode(self, col, func, target=None):
+        """
+        Set target (default col) to func applied to col's categories.
+        func maps an Index of categories to same-length values.
+        """
+        mapped = pd.Index(func(self.categories(col)), dtype=object)
+        uniques = mapped.dropna().unique()
+        lookup = uniques.get_indexer(mapped)
+        codes = self.codes(col)
+        new_codes = np.where(codes >= 0, lookup[codes] if len(lookup) else -1, -1)
+        self.frame[target or col] = pd.Categorical.from_codes(new_codes, categories=uniques)
+        return self
+
+    def take(self, rows):
+        return Timetable(self.frame.iloc[rows].reset_index(drop=True))
+
+    def mask(self, keep):
+        return Timetable(self.frame[np.asarray(keep)].reset_index(drop=True))
+
+    def copy(self):
+        return Timetable(self.frame.copy())
+
+    def memory_usage(self, index=True, deep=True):
+        return self.frame.memory_usage(index=index, deep=deep)
+
+    def to_frame(self):
+        """Plain DataFrame in the CSV schema (categoricals back to strings)."""
+        out = {}
+        for col in self.frame.columns:
+            series = self.frame[col]
+            out[col] = series.astype(str) if isinstance(series.dtype, pd.CategoricalDtype) else series
+        return pd.DataFrame(out)
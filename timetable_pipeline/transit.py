@@ -1,46 +1,104 @@
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
 
+from timetable_pipeline.timetable import Timetable
+
+# Dense form of a transit map: block name → integer id, and a square
+# matrix of required slot gaps indexed by those ids (0 where unknown).
+TransitMatrix = namedtuple("TransitMatrix", ["block_index", "gaps"])
+
+def normalize_block(values):
+    return pd.Series(values).astype(str).str.strip().str.lower()
+
 def build_transit_map(transit_df):
     # Convert transit minutes to slot gaps (1 hour = 1 slot)
-    transit_df['RequiredGap'] = (transit_df['TRANSIT TIME(Minutes)'] / 60).apply(lambda x: max(1, round(x))).astype(int)
+    transit_df['RequiredGap'] = np.maximum(1, np.round(transit_df['TRANSIT TIME(Minutes)'] / 60)).astype(int)
     transit_map = {}
 
-    for _, row in transit_df.iterrows():
-        a = str(row['LOCATION A']).strip().lower()
-        b = str(row['LOCATION B']).strip().lower()
-        g = row['RequiredGap']
+    a_blocks = normalize_block(transit_df['LOCATION A'].values)
+    b_blocks = normalize_block(transit_df['LOCATION B'].values)
+    for a, b, g in zip(a_blocks, b_blocks, transit_df['RequiredGap']):
         transit_map.setdefault(a, {})[b] = g
         transit_map.setdefault(b, {})[a] = g  # Bi-directional gap
     return transit_map
 
+def compile_transit_map(transit_map):
+    """Turn a nested {block: {block: gap}} map into a TransitMatrix."""
+    names = sorted(set(transit_map) | {b for gaps in transit_map.values() for b in gaps})
+    block_index = {name: i for i, name in enumerate(names)}
+    gaps = np.zeros((len(names), len(names)), dtype=np.int64)
+    for a, row in transit_map.items():
+        for b, g in row.items():
+            gaps[block_index[a], block_index[b]] = g
+    return TransitMatrix(block_index, gaps)
+
+def transit_shifts(teacher_codes, slots, block_ids, gaps):
+    """
+    Core of the repair on plain arrays. Returns (order, new_slots): rows
+    sorted by (teacher, slot) and their shifted SlotIndex. block_ids index
+    gaps; an id equal to len(gaps) means "not in the transit map".
+    """
+    order = np.lexsort((slots, teacher_codes))
+    teacher_sorted = teacher_codes[order]
+    slot_sorted = slots[order]
+    block_sorted = block_ids[order]
+
+    # Pad with a zero row/column for blocks missing from the transit map
+    padded = np.pad(gaps, ((0, 1), (0, 1)))
+    required = padded[block_sorted[:-1], block_sorted[1:]]
+    increment = np.zeros(len(order), dtype=np.int64)
+    increment[1:] = np.maximum(0, required - np.diff(slot_sorted))
+    group_start = np.r_[True, teacher_sorted[1:] != teacher_sorted[:-1]]
+    increment[group_start] = 0
+
+    shift = np.cumsum(increment)
+    shift -= np.maximum.accumulate(np.where(group_start, shift, 0))
+    return order, slot_sorted + shift
+
 def repair_transit_violations(df, transit_map):
-    fixed_rows = []
-
-    def shift_schedule(sub_df):
-        sub_df = sub_df.sort_values('SlotIndex').reset_index(drop=True)
-        new_rows = []
-        shift = 0
-        for i in range(len(sub_df)):
-            row = sub_df.loc[i].copy()
-            if i > 0:
-                prev = new_rows[-1]
-                prev_block = str(prev['Block']).strip().lower()
-                curr_block = str(row['Block']).strip().lower()
-                gap = row['SlotIndex'] + shift - prev['SlotIndex']
-                required = transit_map.get(prev_block, {}).get(curr_block, 0)
-                if gap < required:
-                    shift += (required - gap)
-            row['SlotIndex'] += shift
-            new_rows.append(row)
-        return pd.DataFrame(new_rows)
+    """
+    Shift each teacher's sessions later so consecutive sessions respect
+    the required transit gap between their blocks.
+
+    Walking a teacher's sessions in slot order, session i is pushed by
+    max(0, required - (slot[i] - slot[i-1])) on top of every earlier
+    push, so the shifts are a per-teacher cumulative sum computed in one
+    pass over arrays sorted by (teacher, slot).
+
+    Accepts a DataFrame or a Timetable and returns the same kind.
+    """
+    if not isinstance(transit_map, TransitMatrix):
+        transit_map = compile_transit_map(transit_map)
+
+    if len(df) == 0:
+        return df
+    unknown = len(transit_map.gaps)
+
+    if isinstance(df, Timetable):
+        # Normalize block names once per category, not once per row
+        cat_ids = normalize_block(df.categories("Block")).map(transit_map.block_index).fillna(unknown)
+        block_ids = np.append(cat_ids.to_numpy(dtype=np.int64), unknown)[df.codes("Block")]
+        # Transit time matters only across same teacher's sessions
+        teacher_codes, _ = pd.factorize(df.codes("TeacherID"))
+        order, new_slots = transit_shifts(teacher_codes, df.frame["SlotIndex"].to_numpy(), block_ids, transit_map.gaps)
+
+        final = df.take(order)
+        final.frame["SlotIndex"] = new_slots
+        # Drop potential duplicates caused by shifting
+        duplicate = pd.DataFrame({"s": final.codes("SectionID"), "t": new_slots}).duplicated().to_numpy()
+        return final.mask(~duplicate)
 
     # Transit time matters only across same teacher's sessions
-    for tid in df["TeacherID"].astype(str).unique():
-        sub_df = df[df["TeacherID"].astype(str) == tid]
-        repaired = shift_schedule(sub_df)
-        fixed_rows.append(repaired)
+    teacher_codes, _ = pd.factorize(df["TeacherID"].astype(str))
+    block_ids = normalize_block(df["Block"].values).map(transit_map.block_index).fillna(unknown)
+    order, new_slots = transit_shifts(
+        teacher_codes, df["SlotIndex"].to_numpy(), block_ids.to_numpy(dtype=np.int64), transit_map.gaps
+    )
 
-    final_df = pd.concat(fixed_rows, ignore_index=True)
+    final_df = df.iloc[order].reset_index(drop=True)
+    final_df["SlotIndex"] = new_slots
 
     # Drop potential duplicates caused by shifting
     final_df = final_df.drop_duplicates(subset=["SectionID", "SlotIndex"], keep="first")
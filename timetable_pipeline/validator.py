@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+from timetable_pipeline.reference import ROOMTYPE_TO_BLOCK, load_transit_matrix
+from timetable_pipeline.timetable import SLOTS_PER_WEEK, Timetable, intern
+from timetable_pipeline.transit import TransitMatrix, compile_transit_map, normalize_block
+
+BITSET_SLOTS = 64  # occupancy masks are one uint64 per teacher/section/room
+MAX_ISSUES = 500
+ISSUE_KINDS = [
+    "teacher_double_booking",
+    "section_slot_collision",
+    "room_double_booking",
+    "transit_gap_violation",
+    "unmapped_room_type",
+    "slot_out_of_range",
+]
+
+
+def occupancy_bitsets(groups, slots, n_groups):
+    """
+    Per-group 64-bit occupancy masks over the weekly slots.
+
+    groups and slots must already be sorted by (group, slot) and slots must
+    lie in [0, 64). Returns (occupied, clashes): bit s of occupied[g] is set
+    when group g uses slot s, and of clashes[g] when it uses it more than once.
+    """
+    occupied = np.zeros(n_groups, dtype=np.uint64)
+    clashes = np.zeros(n_groups, dtype=np.uint64)
+    if len(groups) == 0:
+        return occupied, clashes
+    if slots.min() < 0 or slots.max() >= BITSET_SLOTS:
+        raise ValueError(f"Occupancy bitsets only hold slots 0-{BITSET_SLOTS - 1}")
+
+    bits = np.left_shift(np.uint64(1), slots.astype(np.uint64))
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    repeated = np.r_[False, (groups[1:] == groups[:-1]) & (slots[1:] == slots[:-1])]
+    occupied[groups[starts]] = np.bitwise_or.reduceat(bits, starts)
+    clashes[groups[starts]] = np.bitwise_or.reduceat(np.where(repeated, bits, np.uint64(0)), starts)
+    return occupied, clashes
+
+
+def _group_rows(rows, *keys):
+    """Yield (key tuple, row positions) for each distinct key combination, sorted by key."""
+    order = np.lexsort(keys[::-1])
+    sorted_keys = [k[order] for k in keys]
+    change = np.zeros(len(order), dtype=bool)
+    change[:1] = True
+    for k in sorted_keys:
+        change[1:] |= k[1:] != k[:-1]
+    starts = np.flatnonzero(change)
+    for start, chunk in zip(starts, np.split(rows[order], starts[1:])):
+        yield tuple(k[start] for k in sorted_keys), chunk.tolist()
+
+
+def _codes(df, col):
+    """Integer codes and vocabulary of a string column (-1 = missing)."""
+    if isinstance(df, Timetable):
+        return df.codes(col), df.categories(col)
+    values = intern(df[col])
+    return values.codes, values.categories
+
+
+def _collisions(kind, key_col, rows, codes, vocab, slots, limit):
+    """Rows sharing a (group, slot) cell, found via per-group clash bitsets."""
+    has_key = codes >= 0
+    rows, codes, slots = rows[has_key], codes[has_key], slots[has_key]
+    order = np.lexsort((slots, codes))
+    _, clashes = occupancy_bitsets(codes[order], slots[order], len(vocab))
+
+    bits = np.left_shift(np.uint64(1), slots.astype(np.uint64))
+    hit = (clashes[codes] & bits) != 0
+    if not hit.any():
+        return 0, []
+
+    issues = [
+        {"type": kind, key_col: str(vocab[code]), "SlotIndex": int(slot), "rows": group}
+        for (code, slot), group in _group_rows(rows[hit], codes[hit], slots[hit])
+    ]
+    return len(issues), issues[:limit]
+
+
+def _transit_violations(rows, teacher_codes, teacher_vocab, slots, blocks, transit_map, limit):
+    """Consecutive sessions of a teacher closer than the required transit gap."""
+    has_teacher = teacher_codes >= 0
+    order = np.flatnonzero(has_teacher)[np.lexsort((slots[has_teacher], teacher_codes[has_teacher]))]
+    rows, teacher_codes, slots, blocks = rows[order], teacher_codes[order], slots[order], blocks[order]
+
+    unknown = len(transit_map.gaps)
+    block_ids = normalize_block(blocks).map(transit_map.block_index).fillna(unknown).to_numpy(dtype=np.int64)
+    padded = np.pad(transit_map.gaps, ((0, 1), (0, 1)))
+    required = padded[block_ids[:-1], block_ids[1:]]
+    gap = np.diff(slots)
+    # Same-slot pairs are double-bookings, reported separately
+    bad = np.flatnonzero((teacher_codes[1:] == teacher_codes[:-1]) & (gap > 0) & (gap < required))
+
+    issues = [
+        {
+            "type": "transit_gap_violation",
+            "TeacherID": str(teacher_vocab[teacher_codes[i + 1]]),
+            "from_slot": int(slots[i]),
+            "to_slot": int(slots[i + 1]),
+            "from_block": str(blocks[i]),
+            "to_block": str(blocks[i + 1]),
+            "required_gap": int(required[i]),
+            "rows": [int(rows[i]), int(rows[i + 1])],
+        }
+        for i in bad[:limit]
+    ]
+    return len(bad), issues
+
+
+def validate_timetable(df, transit_map=None, slots_per_week=SLOTS_PER_WEEK,
+                       room_blocks=ROOMTYPE_TO_BLOCK, limit=MAX_ISSUES):
+    """
+    Check a timetable (DataFrame or Timetable) without running the pipeline.
+
+    Reports teacher double-bookings, section slot collisions, rooms
+    booked twice in a slot (when a RoomID column is present), transit-gap
+    violations between a teacher's consecutive sessions, RoomTypes missing
+    from room_blocks and SlotIndex values outside [0, slots_per_week).
+    Clashes are found with per-teacher, per-section and per-room
+    occupancy bitsets.
+
+    transit_map may be a TransitMatrix or nested dict; by default the
+    reference transit workbook is used, and the transit check is skipped if
+    it is missing. Each issue lists the 0-based positions of the rows
+    involved; at most limit issues are listed per kind, counts are exact.
+    """
+    frame = df.frame if isinstance(df, Timetable) else df
+    n = len(frame)
+    rows = np.arange(n)
+    counts = dict.fromkeys(ISSUE_KINDS, 0)
+    issues = dict((kind, []) for kind in ISSUE_KINDS)
+    missing = [c for c in ("SectionID", "SlotIndex", "TeacherID") if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Timetable is missing required columns: {', '.join(missing)}")
+    if slots_per_week > BITSET_SLOTS:
+        raise ValueError(f"slots_per_week={slots_per_week} exceeds the {BITSET_SLOTS} slots a week's bitset holds")
+
+    # 🕒 SlotIndex must be an integer inside the week
+    slot_values = pd.to_numeric(frame["SlotIndex"], errors="coerce").to_numpy(dtype=np.float64)
+    in_range = (slot_values >= 0) & (slot_values < slots_per_week) & (slot_values == np.floor(slot_values))
+    bad_slots = np.flatnonzero(~in_range)
+    raw_slots = frame["SlotIndex"].to_numpy(dtype=object)
+    counts["slot_out_of_range"] = len(bad_slots)
+    issues["slot_out_of_range"] = [
+        {"type": "slot_out_of_range", "SlotIndex": str(raw_slots[i]), "rows": [int(i)]}
+        for i in bad_slots[:limit]
+    ]
+
+    # 🏷️ RoomType must map to a Block
+    if "RoomType" in frame.columns:
+        room_codes, room_vocab = _codes(df, "RoomType")
+        mapped = pd.Index(room_vocab).str.strip().str.lower().isin(list(room_blocks))
+        unmapped = (room_codes < 0) | ~np.append(mapped, False)[room_codes]
+        if unmapped.any():
+            grouped = [
+                {"type": "unmapped_room_type",
+                 "RoomType": str(room_vocab[code]) if code >= 0 else None,
+                 "rows": group}
+                for (code,), group in _group_rows(rows[unmapped], room_codes[unmapped])
+            ]
+            counts["unmapped_room_type"] = len(grouped)
+            issues["unmapped_room_type"] = grouped[:limit]
+
+    # 🧮 Occupancy bitsets only cover rows with a usable slot
+    rows, slots = rows[in_range], slot_values[in_range].astype(np.int64)
+    teacher_codes, teacher_vocab = _codes(df, "TeacherID")
+    section_codes, section_vocab = _codes(df, "SectionID")
+    teacher_codes, section_codes = teacher_codes[in_range], section_codes[in_range]
+
+    counts["teacher_double_booking"], issues["teacher_double_booking"] = _collisions(
+        "teacher_double_booking", "TeacherID", rows, teacher_codes, teacher_vocab, slots, limit)
+    counts["section_slot_collision"], issues["section_slot_collision"] = _collisions(
+        "section_slot_collision", "SectionID", rows, section_codes, section_vocab, slots, limit)
+    if "RoomID" in frame.columns:
+        room_codes, room_vocab = _codes(df, "RoomID")
+        counts["room_double_booking"], issues["room_double_booking"] = _collisions(
+            "room_double_booking", "RoomID", rows, room_codes[in_range], room_vocab, slots, limit)
+
+    # 🚏 Transit gaps between a teacher's consecutive sessions
+    if "Block" in frame.columns:
+        if transit_map is None:
+            try:
+                transit_map = load_transit_matrix()
+            except FileNotFoundError:
+                transit_map = None
+        elif not isinstance(transit_map, TransitMatrix):
+            transit_map = compile_transit_map(transit_map)
+        if transit_map is not None:
+            blocks = frame["Block"].to_numpy(dtype=object)[in_range]
+            counts["transit_gap_violation"], issues["transit_gap_violation"] = _transit_violations(
+                rows, teacher_codes, teacher_vocab, slots, blocks, transit_map, limit)
+
+    return {
+        "valid": not any(counts.values()),
+        "rows": n,
+        "counts": counts,
+        "issues": issues,
+    }